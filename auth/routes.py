@@ -1,34 +1,58 @@
+import os
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from .schemas import UserRegister, UserLogin, Token
 from .auth_utils import hash_password, verify_password, create_access_token
 from .models import User
-from db.database import get_db
+from db.database import get_async_db
+from inference_pool import InferencePool, PoolSaturated
+
+# argon2 is CPU-bound and holds the GIL, so it runs in its own small process
+# pool instead of the threadpool /match shares; a full pool answers 429.
+AUTH_HASH_WORKERS = int(os.getenv("AUTH_HASH_WORKERS", "2"))
+AUTH_HASH_QUEUE = int(os.getenv("AUTH_HASH_QUEUE", "64"))
+
+hash_pool = InferencePool(AUTH_HASH_WORKERS, AUTH_HASH_QUEUE, processes=True)
 
 router = APIRouter()
 
+
+async def _offload(fn, *args):
+    try:
+        return await hash_pool.run(fn, *args)
+    except PoolSaturated as exc:
+        raise HTTPException(status_code=429, detail="Too many sign-ins, please retry.",
+                            headers={"Retry-After": str(exc.retry_after)})
+
+
 @router.post("/register")
-def register(user: UserRegister, db: Session = Depends(get_db)):
-    existing = db.query(User).filter(User.email == user.email).first()
+async def register(user: UserRegister, db: AsyncSession = Depends(get_async_db)):
+    existing = await db.scalar(select(User.id).where(User.email == user.email))
     if existing:
         raise HTTPException(status_code=400, detail="Email already registered")
-    
+
     new_user = User(
         first_name=user.first_name,
         last_name=user.last_name,
         email=user.email,
         mobile=user.mobile,
-        password=hash_password(user.password),
+        password=await _offload(hash_password, user.password),
     )
     db.add(new_user)
-    db.commit()
+    try:
+        await db.commit()
+    except IntegrityError:
+        # a concurrent registration took the email between the check and the insert
+        raise HTTPException(status_code=400, detail="Email already registered")
     return {"message": "User account created successfully"}
 
 @router.post("/login", response_model=Token)
-def login(user: UserLogin, db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.email == user.email).first()
-    if not db_user or not verify_password(user.password, db_user.password):
+async def login(user: UserLogin, db: AsyncSession = Depends(get_async_db)):
+    hashed = await db.scalar(select(User.password).where(User.email == user.email))
+    if hashed is None or not await _offload(verify_password, user.password, hashed):
         raise HTTPException(status_code=401, detail="Invalid credentials")
-    
-    token = create_access_token({"sub": db_user.email})
+
+    token = create_access_token({"sub": user.email})
     return {"access_token": token, "token_type": "bearer"}
@@ -0,0 +1,123 @@
+"""
+Load-test /register and /login against a local database.
+
+    python -m benchmarks.login --users 200 --logins 1000 --concurrency 50
+    python -m benchmarks.login --database-url postgresql://user:pw@localhost/bench
+
+Defaults to a throwaway SQLite file. Reports register/login latency
+percentiles, throughput and status counts, plus the latency of two trivial
+endpoints probed during the login storm: an async one (event loop) and a
+sync one (FastAPI's threadpool, which /match used to share with auth).
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+
+from benchmarks.run import summarize
+
+
+async def run(args):
+    import httpx
+    from fastapi import FastAPI
+    from auth.routes import router, hash_pool
+    from auth.models import User  # noqa: F401  (registers the table)
+    from db.database import Base, engine, async_engine
+
+    Base.metadata.create_all(engine)
+    app = FastAPI()
+    app.include_router(router)
+
+    @app.get("/ping")
+    async def ping():
+        return {}
+
+    @app.get("/ping-sync")
+    def ping_sync():
+        return {}
+
+    transport = httpx.ASGITransport(app=app)
+    slots = asyncio.Semaphore(args.concurrency)
+    statuses = {"register": Counter(), "login": Counter()}
+    latencies = {"register": [], "login": [], "probe_async": [], "probe_sync": []}
+
+    async def call(client, kind, path, body):
+        async with slots:
+            start = time.perf_counter()
+            response = await client.post(path, json=body)
+            latencies[kind].append(time.perf_counter() - start)
+            statuses[kind][response.status_code] += 1
+
+    async def probe(client, done):
+        while not done.is_set():
+            for kind, path in (("probe_async", "/ping"), ("probe_sync", "/ping-sync")):
+                start = time.perf_counter()
+                await client.get(path)
+                latencies[kind].append(time.perf_counter() - start)
+            await asyncio.sleep(0.01)
+
+    run_id = int(time.time())
+    users = [{"first_name": "Bench", "last_name": str(i), "mobile": "555-0100",
+              "email": f"bench{run_id}.{i}@example.com", "password": f"pw-{i}",
+              "confirm_password": f"pw-{i}"} for i in range(args.users)]
+    rng = random.Random(args.seed)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            start = time.perf_counter()
+            await asyncio.gather(*(call(client, "register", "/register", u) for u in users))
+            register_s = time.perf_counter() - start
+
+            done = asyncio.Event()
+            prober = asyncio.create_task(probe(client, done))
+            logins = [rng.choice(users) for _ in range(args.logins)]
+            start = time.perf_counter()
+            await asyncio.gather(*(call(client, "login", "/login",
+                                        {"email": u["email"], "password": u["password"]})
+                                   for u in logins))
+            login_s = time.perf_counter() - start
+            done.set()
+            await prober
+    finally:
+        hash_pool.shutdown()
+        await async_engine.dispose()
+
+    return {
+        "meta": {"database": engine.url.render_as_string(hide_password=True),
+                 "users": args.users, "logins": args.logins, "concurrency": args.concurrency,
+                 "hash_workers": hash_pool.max_workers},
+        "latency_ms": {kind: summarize(s) for kind, s in latencies.items() if s},
+        "throughput_rps": {"register": args.users / register_s, "login": args.logins / login_s},
+        "status": {kind: dict(c) for kind, c in statuses.items()},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--logins", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--database-url", help="defaults to a temporary SQLite file")
+    parser.add_argument("--out", help="write the report as JSON")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="waynova-login-") as tmp:
+        # db.database reads these at import time
+        os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{tmp}/bench.db"
+        os.environ.setdefault("SECRET_KEY", "benchmark-only-secret")
+        report = asyncio.run(run(args))
+
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
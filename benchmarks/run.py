@@ -0,0 +1,252 @@
+"""
+Benchmark the load + /match pipeline on synthetic data.
+
+    python -m benchmarks.run --buyers 2000 --grants 10000 --out bench.json
+    python -m benchmarks.run --buyers 2000 --grants 10000 --compare bench.json
+
+Reports cold/warm load time, peak RSS, per-stage /match latency percentiles
+and sequential / concurrent / batch throughput. ``--compare`` diffs the run
+against a saved baseline and exits non-zero on regressions.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+def peak_rss_mb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1 << 20) if sys.platform == "darwin" else rss / 1024
+
+
+def summarize(samples_s):
+    ms = np.asarray(samples_s) * 1000
+    out = {f"p{p}": float(np.percentile(ms, p)) for p in PERCENTILES}
+    out.update(mean=float(ms.mean()), max=float(ms.max()), n=len(ms))
+    return out
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# ----------------- Runs -----------------
+def setup_model(args):
+    from embedding import embedding_service
+    if args.model == "stub":
+        from benchmarks.stub_model import HashingEncoder
+        embedding_service.model = HashingEncoder(args.dim)
+        embedding_service.model_name = f"stub-hashing-{args.dim}"
+    else:
+        embedding_service.model_name = args.model
+        embedding_service.backend = args.backend
+
+
+def measure_load(buyers_csv, grants_csv):
+    from data_loader import buyer_indexer, grant_indexer, BuyerIndexer, GrantIndexer
+    from precompute import buyer_grant_neighbors
+
+    start = time.perf_counter()
+    buyer_indexer.load_buyers(buyers_csv)
+    buyers_s = time.perf_counter() - start
+    start = time.perf_counter()
+    grant_indexer.load_grants(grants_csv)
+    grants_s = time.perf_counter() - start
+    start = time.perf_counter()
+    buyer_grant_neighbors.build()
+    precompute_s = time.perf_counter() - start
+    rss_cold = peak_rss_mb()
+
+    # warm start: fresh indexers mapping the cache entries written above
+    start = time.perf_counter()
+    BuyerIndexer(index_type=buyer_indexer.index_type).load_buyers(buyers_csv)
+    GrantIndexer(index_type=grant_indexer.index_type).load_grants(grants_csv)
+    warm_s = time.perf_counter() - start
+    return {"buyers_s": buyers_s, "grants_s": grants_s, "precompute_s": precompute_s,
+            "cold_s": buyers_s + grants_s + precompute_s, "warm_s": warm_s,
+            "peak_rss_mb_after_load": rss_cold}
+
+
+def measure_latency(rep_inputs, use_precomputed):
+    """Per-stage latency from the pipeline's own timing spans (see metrics.py)."""
+    from match_engine import get_ranked_matches_cosine
+    from metrics import collect_timings
+
+    samples = defaultdict(list)
+    for rep_input in rep_inputs:
+        start = time.perf_counter()
+        with collect_timings() as timings:
+            get_ranked_matches_cosine(rep_input, use_precomputed=use_precomputed)
+        timings["total"] = time.perf_counter() - start
+        for stage, seconds in timings.items():
+            samples[stage].append(seconds)
+    return ({stage: summarize(s) for stage, s in samples.items()},
+            len(rep_inputs) / sum(samples["total"]))
+
+
+def measure_concurrent(rep_inputs, workers, use_precomputed):
+    from match_engine import get_ranked_matches_cosine
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(lambda r: get_ranked_matches_cosine(r, use_precomputed=use_precomputed),
+                      rep_inputs))
+    return len(rep_inputs) / (time.perf_counter() - start)
+
+
+def measure_batch(rep_inputs, chunk, use_precomputed):
+    from match_engine import get_ranked_matches_batch
+    start = time.perf_counter()
+    for i in range(0, len(rep_inputs), chunk):
+        get_ranked_matches_batch(rep_inputs[i:i + chunk], use_precomputed=use_precomputed)
+    return len(rep_inputs) / (time.perf_counter() - start)
+
+
+def run(args, data_dir):
+    from benchmarks.synthetic import write_dataset, generate_rep_inputs
+    from models import SalesRepDropdownInput
+    from config import GRANT_INDEX_TYPE, BUYER_INDEX_TYPE, BATCH_CHUNK_SIZE, MATCH_WORKERS
+    from match_engine import get_ranked_matches_cosine
+    from data_loader import buyer_indexer, grant_indexer
+
+    buyers_csv, grants_csv = write_dataset(data_dir, args.buyers, args.grants, args.seed)
+    setup_model(args)
+    rep_inputs = [SalesRepDropdownInput(**r)
+                  for r in generate_rep_inputs(args.requests, args.seed + 2)]
+    use_precomputed = not args.exact
+
+    load = measure_load(buyers_csv, grants_csv)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for rep_input in rep_inputs[:args.warmup]:
+            get_ranked_matches_cosine(rep_input, use_precomputed=use_precomputed)
+        stages, sequential = measure_latency(rep_inputs, use_precomputed)
+        concurrent = measure_concurrent(rep_inputs, args.concurrency or MATCH_WORKERS,
+                                        use_precomputed)
+        batch = measure_batch(rep_inputs, BATCH_CHUNK_SIZE, use_precomputed)
+
+    return {
+        "meta": {"commit": git_commit(), "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                 "python": platform.python_version(), "machine": platform.machine(),
+                 "buyers": args.buyers, "grants": args.grants, "requests": args.requests,
+                 "model": args.model, "backend": args.backend, "dim": args.dim,
+                 "precomputed": use_precomputed, "result_cache": args.warm_caches,
+                 "buyer_index": BUYER_INDEX_TYPE, "grant_index": GRANT_INDEX_TYPE},
+        "load": load,
+        "peak_rss_mb": peak_rss_mb(),
+        "text_tokens": {"buyers": buyer_indexer.text_builder.stats(),
+                        "grants": grant_indexer.text_builder.stats()},
+        "latency_ms": stages,
+        "throughput_rps": {"sequential": sequential, "concurrent": concurrent,
+                           "batch": batch},
+    }
+
+
+# ----------------- Baseline Comparison -----------------
+def flatten(report):
+    """Comparable metrics as {name: (value, higher_is_better)}."""
+    metrics = {f"load.{k}": (v, False) for k, v in report["load"].items()}
+    metrics["peak_rss_mb"] = (report["peak_rss_mb"], False)
+    for name, stats in report.get("text_tokens", {}).items():
+        if stats.get("rows"):
+            metrics[f"text_tokens.{name}.mean"] = (stats["mean"], False)
+    for stage, stats in report["latency_ms"].items():
+        for p in ("p50", "p95", "p99"):
+            metrics[f"latency_ms.{stage}.{p}"] = (stats[p], False)
+    for mode, rps in report["throughput_rps"].items():
+        metrics[f"throughput_rps.{mode}"] = (rps, True)
+    return metrics
+
+
+def compare(baseline, current, tolerance, min_ms=0.0):
+    """
+    Print metric deltas; returns the names that got worse by more than
+    ``tolerance``. Latency changes under ``min_ms`` are treated as noise.
+    """
+    keys = ("buyers", "grants", "requests", "model", "precomputed", "buyer_index", "grant_index")
+    if any(baseline["meta"].get(k) != current["meta"].get(k) for k in keys):
+        print("[WARN] baseline was run with different settings; deltas may not be comparable")
+    old, new = flatten(baseline), flatten(current)
+    regressions = []
+    print(f"{'metric':<44}{'baseline':>12}{'current':>12}{'change':>9}")
+    for name, (value, higher_is_better) in new.items():
+        if name not in old:
+            continue
+        base = old[name][0]
+        change = (value - base) / base if base else 0.0
+        worse = -change if higher_is_better else change
+        noise = name.startswith("latency_ms.") and abs(value - base) < min_ms
+        flag = "  REGRESSION" if worse > tolerance and not noise else ""
+        if flag:
+            regressions.append(name)
+        print(f"{name:<44}{base:>12.3f}{value:>12.3f}{change:>+9.1%}{flag}")
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--buyers", type=int, default=1000)
+    parser.add_argument("--grants", type=int, default=5000)
+    parser.add_argument("--requests", type=int, default=200, help="/match calls to time")
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--model", default="stub",
+                        help='"stub" (offline hashing encoder) or a sentence-transformers name')
+    parser.add_argument("--backend", default="torch", help="embedding backend for real models")
+    parser.add_argument("--dim", type=int, default=384, help="stub embedding size")
+    parser.add_argument("--exact", action="store_true",
+                        help="search grants per buyer instead of precomputed neighbours")
+    parser.add_argument("--concurrency", type=int, default=0,
+                        help="threads for the concurrent run (default MATCH_WORKERS)")
+    parser.add_argument("--warm-caches", action="store_true",
+                        help="keep the query/result caches on (off by default)")
+    parser.add_argument("--data-dir", help="keep the generated CSVs and index cache here")
+    parser.add_argument("--out", help="write the report as JSON")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="relative slowdown counted as a regression")
+    parser.add_argument("--min-ms", type=float, default=0.5,
+                        help="ignore latency changes smaller than this (ms)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    with tempfile.TemporaryDirectory(prefix="waynova-bench-") as tmp:
+        data_dir = args.data_dir or tmp
+        # config is read at import time, so these must be set before any repo import
+        os.environ["INDEX_CACHE_DIR"] = os.path.join(data_dir, "index_cache")
+        if not args.warm_caches:
+            os.environ["QUERY_CACHE_SIZE"] = "0"
+            os.environ["RESULT_CACHE_SIZE"] = "0"
+        report = run(args, data_dir)
+
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), report, args.tolerance, args.min_ms)
+        if regressions:
+            print(f"[WARN] {len(regressions)} metric(s) regressed beyond {args.tolerance:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
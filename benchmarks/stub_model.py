@@ -0,0 +1,29 @@
+import zlib
+
+import numpy as np
+
+
+class HashingEncoder:
+    """
+    Offline stand-in for a SentenceTransformer: hashed unigram + bigram
+    counts projected to ``dim`` signed buckets. Deterministic and fast, so
+    benchmarks exercise indexing and matching without downloading a model;
+    texts sharing words still land near each other.
+    """
+
+    def __init__(self, dim=384):
+        self.dim = dim
+        self.tokenizer = None
+        self.max_seq_length = 512
+
+    def get_sentence_embedding_dimension(self):
+        return self.dim
+
+    def encode(self, texts, convert_to_numpy=True, show_progress_bar=False, **kwargs):
+        out = np.zeros((len(texts), self.dim), dtype="float32")
+        for i, text in enumerate(texts):
+            words = str(text).lower().split()
+            for feature in words + [a + " " + b for a, b in zip(words, words[1:])]:
+                h = zlib.crc32(feature.encode("utf-8"))
+                out[i, h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+        return out
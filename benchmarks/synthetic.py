@@ -0,0 +1,124 @@
+import argparse
+import csv
+import os
+import random
+from datetime import date, timedelta
+
+from features import US_STATES
+
+# Column layout of the real buyer / grant CSVs.
+BUYER_COLUMNS = ("Agency Name", "Agency Type", "State", "Product Name", "Budget")
+GRANT_COLUMNS = ("Grant Program Name", "Administering Agency", "Purpose", "Focus Areas",
+                 "Eligible Applicants", "Eligible Equipment/Expenses", "Award Amount Range",
+                 "Application Deadline", "Grant URL")
+
+AGENCY_TYPES = ("Fire Department", "EMS", "Law Enforcement", "Sheriff's Office",
+                "Emergency Management", "Public Works", "School District", "Hospital")
+PRODUCTS = ("Radios", "Body Armor", "Thermal Cameras", "Drones", "Ambulance",
+            "Extrication Tools", "Body-Worn Cameras", "SCBA", "Turnout Gear", "Defibrillators",
+            "License Plate Readers", "Mobile Data Terminals", "Rescue Boats", "Generators",
+            "Hazmat Detectors", "Dispatch Software", "Fire Hose", "Night Vision", "Tasers",
+            "Emergency Sirens")
+FOCUS_AREAS = ("public safety", "fire prevention", "emergency medical services",
+               "disaster preparedness", "homeland security", "community policing",
+               "rural health", "wildfire mitigation", "interoperable communications",
+               "school safety", "hazard mitigation", "cybersecurity")
+PLACES = ("County", "City", "Township", "Valley", "Harbor", "Ridge", "Springs", "Lake")
+FUNDERS = ("Department of Homeland Security", "FEMA", "Department of Justice",
+           "Office of Emergency Services", "Department of Health", "State Fire Marshal",
+           "Bureau of Justice Assistance", "Department of Transportation")
+AWARD_RANGES = ("$5,000 - $25,000", "$10,000 - $50,000", "$25,000 - $150,000",
+                "$50,000 - $500,000", "Up to $1,000,000", "Varies")
+BUDGETS = ("$25k", "$50k", "$100k", "$250k", "$500k", "$1M", "")
+
+STATES = tuple(s.title() for s in US_STATES)
+
+
+def generate_buyers(n, seed=0):
+    """``n`` buyer rows with the real buyer columns."""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n):
+        state = rng.choice(STATES)
+        agency_type = rng.choice(AGENCY_TYPES)
+        rows.append({
+            "Agency Name": f"{rng.choice(PLACES)} {i} {agency_type}",
+            "Agency Type": agency_type,
+            "State": state,
+            "Product Name": "/".join(rng.sample(PRODUCTS, rng.randint(1, 3))),
+            "Budget": rng.choice(BUDGETS),
+        })
+    return rows
+
+
+def generate_grants(n, seed=0, today=None):
+    """
+    ``n`` grant rows with the real grant columns.
+
+    About a third are national (no state named), deadlines mix past, upcoming,
+    blank and "Rolling", and equipment lists use the plural / hyphen variants
+    the keyword matcher has to normalize.
+    """
+    rng = random.Random(seed)
+    today = today or date.today()
+    rows = []
+    for i in range(n):
+        products = rng.sample(PRODUCTS, rng.randint(1, 4))
+        applicants = rng.sample(AGENCY_TYPES, rng.randint(1, 3))
+        states = [] if rng.random() < 0.35 else rng.sample(STATES, rng.randint(1, 2))
+        where = f" in {' and '.join(states)}" if states else " nationwide"
+        roll = rng.random()
+        if roll < 0.1:
+            deadline = ""
+        elif roll < 0.15:
+            deadline = "Rolling"
+        else:
+            deadline = (today + timedelta(days=rng.randint(-180, 540))).isoformat()
+        rows.append({
+            "Grant Program Name": f"{rng.choice(FOCUS_AREAS).title()} Grant {i}",
+            "Administering Agency": rng.choice(FUNDERS),
+            "Purpose": f"Support {applicants[0]} agencies{where} purchasing "
+                       f"{' and '.join(p.lower() for p in products[:2])}",
+            "Focus Areas": "; ".join(rng.sample(FOCUS_AREAS, rng.randint(1, 3))),
+            "Eligible Applicants": "; ".join(applicants),
+            "Eligible Equipment/Expenses": "; ".join(
+                p.rstrip("s") if rng.random() < 0.3 else p for p in products),
+            "Award Amount Range": rng.choice(AWARD_RANGES),
+            "Application Deadline": deadline,
+            "Grant URL": f"https://grants.example.gov/{i}",
+        })
+    return rows
+
+
+def generate_rep_inputs(n, seed=0):
+    """``n`` rep dropdown selections (agency_type, product_type, state) as dicts."""
+    rng = random.Random(seed)
+    return [{"agency_type": rng.choice(AGENCY_TYPES), "product_type": rng.choice(PRODUCTS),
+             "state": rng.choice(STATES)} for _ in range(n)]
+
+
+def write_csv(path, rows, columns):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def write_dataset(out_dir, buyers, grants, seed=0):
+    """Write buyers.csv / grants.csv into ``out_dir``; returns their paths."""
+    os.makedirs(out_dir, exist_ok=True)
+    buyers_csv = os.path.join(out_dir, "buyers.csv")
+    grants_csv = os.path.join(out_dir, "grants.csv")
+    write_csv(buyers_csv, generate_buyers(buyers, seed), BUYER_COLUMNS)
+    write_csv(grants_csv, generate_grants(grants, seed + 1), GRANT_COLUMNS)
+    return buyers_csv, grants_csv
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write synthetic buyer/grant CSVs.")
+    parser.add_argument("out_dir")
+    parser.add_argument("--buyers", type=int, default=1000)
+    parser.add_argument("--grants", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    print("\n".join(write_dataset(args.out_dir, args.buyers, args.grants, args.seed)))
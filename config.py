@@ -0,0 +1,86 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Source CSVs for the buyer and grant indexes.
+BUYERS_CSV = os.getenv("BUYERS_CSV", "data/buyer_profiles_real.csv")
+GRANTS_CSV = os.getenv("GRANTS_CSV", "data/Cal_Grants.csv")
+# Build/load the indexes in the background after startup (/ready reports progress).
+# 0 blocks startup until they are loaded.
+LOAD_IN_BACKGROUND = os.getenv("LOAD_IN_BACKGROUND", "1") == "1"
+
+# Directory for persisted embeddings / FAISS indexes. Empty string disables the cache.
+INDEX_CACHE_DIR = os.getenv("INDEX_CACHE_DIR", ".index_cache")
+# Map cached FAISS indexes read-only instead of reading them into each process.
+INDEX_MMAP = os.getenv("INDEX_MMAP", "1") == "1"
+
+# Seconds between CSV change checks for incremental re-indexing. 0 disables the watcher.
+DATA_WATCH_INTERVAL = float(os.getenv("DATA_WATCH_INTERVAL", "0"))
+
+# Grant neighbours precomputed per buyer, and how strongly the rep query vector
+# shifts a buyer's vector when re-ranking them (stands in for re-encoding the
+# buyer text with the rep's product_type/state appended).
+PRECOMPUTE_TOP_N = int(os.getenv("PRECOMPUTE_TOP_N", "50"))
+QUERY_ADJUST_WEIGHT = float(os.getenv("QUERY_ADJUST_WEIGHT", "0.15"))
+
+# /match worker pool: concurrent jobs and how many more may wait before 429s.
+MATCH_WORKERS = int(os.getenv("MATCH_WORKERS", "4"))
+MATCH_QUEUE_SIZE = int(os.getenv("MATCH_QUEUE_SIZE", "32"))
+
+# Query-embedding and ranked-result caches (entries; TTL in seconds). Size 0 disables.
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "1024"))
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "256"))
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", "300"))
+
+# Rep inputs encoded and ranked together per step of /match/batch.
+BATCH_CHUNK_SIZE = int(os.getenv("BATCH_CHUNK_SIZE", "64"))
+
+# Largest page a /match or /match/batch caller may ask for with ?limit=.
+MATCH_MAX_LIMIT = int(os.getenv("MATCH_MAX_LIMIT", "100"))
+
+# FAISS index type per indexer: flat | ivf | hnsw | ivfpq | ivfsq8, plus build/search knobs
+# (0 = pick automatically from the dataset size / dimension).
+GRANT_INDEX_TYPE = os.getenv("GRANT_INDEX_TYPE", "flat")
+BUYER_INDEX_TYPE = os.getenv("BUYER_INDEX_TYPE", "flat")
+INDEX_NLIST = int(os.getenv("INDEX_NLIST", "0"))
+INDEX_NPROBE = int(os.getenv("INDEX_NPROBE", "16"))
+INDEX_EF_SEARCH = int(os.getenv("INDEX_EF_SEARCH", "64"))
+INDEX_HNSW_M = int(os.getenv("INDEX_HNSW_M", "32"))
+INDEX_PQ_M = int(os.getenv("INDEX_PQ_M", "0"))
+
+# Restrict /match retrieval to buyers in the rep's state/agency type and open,
+# in-state (or national) grants, inside the FAISS search.
+MATCH_PREFILTER = os.getenv("MATCH_PREFILTER", "1") == "1"
+
+# Rows read, embedded and indexed per step when ingesting a CSV.
+INGEST_CHUNK_ROWS = int(os.getenv("INGEST_CHUNK_ROWS", "5000"))
+
+# Text embedded per row: these columns in priority order (comma-separated; empty =
+# every column in CSV order), cut to EMBED_TEXT_MAX_TOKENS tokens (0 = model window).
+GRANT_TEXT_FIELDS = os.getenv(
+    "GRANT_TEXT_FIELDS",
+    "Grant Program Name,Purpose,Focus Areas,Eligible Equipment/Expenses,Eligible Applicants")
+BUYER_TEXT_FIELDS = os.getenv("BUYER_TEXT_FIELDS", "Product Name,Agency Type,Agency Name,State")
+EMBED_TEXT_MAX_TOKENS = int(os.getenv("EMBED_TEXT_MAX_TOKENS", "0"))
+
+# Embedding backend: "torch" (fp32 PyTorch), "onnx" (ONNX Runtime) or "onnx-int8"
+# (dynamically int8-quantized ONNX, exported once into EMBEDDING_ONNX_DIR).
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+EMBEDDING_ONNX_DIR = os.getenv("EMBEDDING_ONNX_DIR", ".onnx_models")
+EMBEDDING_QUANT_CONFIG = os.getenv("EMBEDDING_QUANT_CONFIG", "avx2")  # arm64 / avx2 / avx512 / avx512_vnni
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "1"))
+
+# LOG_LEVEL=DEBUG prints a line per scored buyer/grant candidate (off the hot path otherwise).
+DEBUG_LOG = os.getenv("LOG_LEVEL", "INFO").upper() == "DEBUG"
+
+# State sharding. SHARD_MAP names the state shards, e.g.
+# "west=california,nevada,oregon;south=texas,florida"; an implicit "national"
+# shard holds every other state. Each shard also keeps the national
+# (no-state) rows, so a single-state query is answered by one shard.
+# SHARD_NAME makes this process serve one shard; SHARD_NODES
+# ("west=http://host:8101,national=http://host:8100") makes it a router.
+SHARD_MAP = os.getenv("SHARD_MAP", "")
+SHARD_NAME = os.getenv("SHARD_NAME", "")
+SHARD_NODES = os.getenv("SHARD_NODES", "")
+SHARD_TIMEOUT = float(os.getenv("SHARD_TIMEOUT", "30"))
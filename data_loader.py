@@ -1,88 +1,446 @@
-import pandas as pd
-import faiss
+import contextlib
+import hashlib
+import os
+import threading
 import numpy as np
-from sentence_transformers import SentenceTransformer
-import torch
-torch.set_num_threads(1)
+from embedding import embedding_service
+from index_cache import index_cache, cache_key
+from ingest import ingest_csv, iter_records, csv_columns, EmbeddingSpool
+from records import RecordStore
+from features import GrantFeatureStore, states_in_cell, states_mentioned
+from metadata import MetadataIndex, search_params
+from index_factory import (build_index, build_key, configure_search, supports_remove,
+                           writable_copy, recall_at_k)
+from sharding import shard_map
+from text_builder import TextBuilder
+from config import (GRANT_INDEX_TYPE, BUYER_INDEX_TYPE, INGEST_CHUNK_ROWS, BUYERS_CSV, GRANTS_CSV,
+                    SHARD_NAME, GRANT_TEXT_FIELDS, BUYER_TEXT_FIELDS, EMBED_TEXT_MAX_TOKENS)
 
 
-def normalize_embeddings(embeddings: np.ndarray) -> np.ndarray:
-    """Normalize embeddings so cosine similarity = inner product."""
-    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
-    return embeddings / np.maximum(norms, 1e-12)
+# ----------------- Index State -----------------
+class IndexState:
+    """
+    One immutable snapshot of an indexer's data.
 
+    Row ids are positions in ``records`` (a RecordStore) / ``embeddings`` and
+    are also the FAISS ids. Deleted rows read back as ``None`` so ids stay
+    stable across incremental refreshes. ``keys`` / ``digests`` hold each
+    live row's key and content digest (see ``row_digest``) by row id.
+    Refreshes build a new snapshot and swap it in with a
+    single assignment, so in-flight searches never see a half-built index.
+    """
 
-# ----------------- Grant Indexer -----------------
-class GrantIndexer:
-    def __init__(self):
-        self.model = SentenceTransformer("BAAI/bge-base-en-v1.5")
-        self.index = None
-        self.grants = []
+    __slots__ = ("records", "embeddings", "index", "keys", "digests", "features", "metadata",
+                 "version")
 
-    def load_grants(self, csv_path):
-        df = pd.read_csv(csv_path, encoding="utf-8-sig").fillna("")
-        df.columns = df.columns.str.strip()
-        self.grants = df.to_dict(orient="records")
-
-        # ✅ Use actual cell values (not column names)
-        texts = [
-            " ".join(str(value) for value in row.values()) for row in self.grants
-        ]
-
-        embeddings = self.model.encode(texts, convert_to_numpy=True, show_progress_bar=True)
-        embeddings = normalize_embeddings(embeddings)
-
-        dim = embeddings.shape[1]
-        self.index = faiss.IndexFlatIP(dim)
-        self.index.add(embeddings.astype("float32"))
-
-    def search(self, query_text, top_k=5):
-        query_vec = self.model.encode([query_text], convert_to_numpy=True)
-        query_vec = normalize_embeddings(query_vec)
-        scores, indices = self.index.search(query_vec.astype("float32"), top_k)
+    def __init__(self, records, embeddings, index, keys, digests, features=None, metadata=None,
+                 version=0):
+        self.records = records
+        self.embeddings = embeddings
+        self.index = index
+        self.keys = keys
+        self.digests = digests
+        self.features = features
+        self.metadata = metadata
+        self.version = version
+
+
+def row_digest(values) -> int:
+    """Stable 64-bit digest of a row's values (``hash()`` is salted per process)."""
+    digest = hashlib.blake2b(digest_size=8)
+    for value in values:
+        digest.update(str(value).encode("utf-8") + b"\0")
+    return int.from_bytes(digest.digest(), "little")
+
+
+def _section(arrays, prefix):
+    return {name[len(prefix):]: a for name, a in arrays.items() if name.startswith(prefix)}
+
+
+# ----------------- CSV Indexer -----------------
+class CsvIndexer:
+    """
+    Embeds every row of a CSV and serves cosine top-k search over them.
+
+    With a ``shard`` name only the rows that shard holds (see sharding.py)
+    are loaded.
+    """
+
+    # Columns that identify a row across CSV revisions (None = whole row).
+    key_fields = None
+    # Columns embedded, highest signal first (None = every column); see TextBuilder.
+    text_fields = None
+    # Per-row feature store saved with the cache entry (see features.GrantFeatureStore).
+    feature_store = None
+
+    def __init__(self, embedder=embedding_service, cache=index_cache, index_type="flat",
+                 shard=None):
+        self.embedder = embedder
+        self.cache = cache
+        self.index_type = index_type
+        self.shard = shard or None
+        self.text_builder = TextBuilder(embedder, self.text_fields, EMBED_TEXT_MAX_TOKENS)
+        self._state = None
+        self._refresh_lock = threading.RLock()
+        self._cache_entry = None
+        self._watcher = None
+        self._swap_callbacks = []
+
+    @property
+    def records(self):
+        return self._state.records if self._state else RecordStore.from_batches([])
+
+    @property
+    def embeddings(self):
+        return self._state.embeddings if self._state else None
+
+    @property
+    def index(self):
+        return self._state.index if self._state else None
+
+    @property
+    def features(self):
+        return self._state.features if self._state else None
+
+    @property
+    def metadata(self):
+        return self._state.metadata if self._state else None
+
+    @property
+    def version(self):
+        return self._state.version if self._state else 0
+
+    def row_text(self, record):
+        return self.text_builder(record)
+
+    def row_states(self, record):
+        """States a row is tied to (empty for national rows)."""
+        states = states_in_cell(record.get("State", ""))
+        return states or states_mentioned(" ".join(str(v) for v in record.values()).lower())
+
+    def owns(self, record):
+        """Whether this indexer's shard holds ``record`` (always, when unsharded)."""
+        return self.shard is None or self.shard in shard_map.shards_for(self.row_states(record))
+
+    def build_metadata(self, records, features):
+        """Per-row state / agency type masks used for filtered search."""
+        states, agencies = [], []
+        for record in records:
+            if record is None:
+                states.append(None)
+                agencies.append(None)
+                continue
+            states.append(self.row_states(record))
+            agencies.append(" ".join(str(record.get("Agency Type", "")).lower().split()))
+        return MetadataIndex(states, agencies)
+
+    def row_key(self, record, seen):
+        """Stable key for a row; repeated keys are told apart by occurrence order (``seen``)."""
+        if self.key_fields:
+            base = tuple(str(record.get(f, "")).strip() for f in self.key_fields)
+        else:
+            base = tuple(str(v) for v in record.values())
+        n = seen.get(base, 0)
+        seen[base] = n + 1
+        return base + (n,)
+
+    def load_csv(self, csv_path):
+        """
+        Full (re)build, or a warm load from the on-disk cache.
+
+        The build runs under the cache's cross-process lock, so when several
+        workers start together one builds and the rest map its cache entry.
+        """
+        key = self._cache_key(csv_path)
+        with self._refresh_lock, self._cache_lock(key):
+            self._load(csv_path, key)
+
+    def _load(self, csv_path, key):
+        cached = self._load_cached(key)
+        if cached is None:
+            records, embeddings = ingest_csv(csv_path, self.row_text, self.embedder,
+                                             label=type(self).__name__,
+                                             keep=self.owns if self.shard else None)
+            stats = self.text_builder.stats()
+            if stats["rows"]:
+                print(f"[INFO] {type(self).__name__}: text tokens mean {stats['mean']:.1f}, "
+                      f"p95 {stats['p95']:.0f}, max {stats['max']} "
+                      f"({stats['truncated']} of {stats['rows']} cut to {stats['budget']})")
+            index = build_index(embeddings, np.arange(len(records)), self.index_type)
+            cached = self._store(key, records, embeddings, index)
+        self._swap(*cached)
+        self._cache_entry = key
+
+    def refresh(self, csv_path):
+        """
+        Incrementally sync the index with ``csv_path``.
+
+        Only added or changed rows are embedded; removed rows are deleted from
+        the FAISS index by id. Returns counts of added/changed/removed rows.
+        If another worker already synced this revision of the CSV, its cache
+        entry is mapped instead.
+        """
+        if self._state is None:
+            self.load_csv(csv_path)
+            return {"added": len(self.records), "changed": 0, "removed": 0}
+
+        key = self._cache_key(csv_path)
+        with self._refresh_lock, self._cache_lock(key):
+            if key == self._cache_entry:
+                return {"added": 0, "changed": 0, "removed": 0}
+            cached = self._load_cached(key)
+            if cached is not None:
+                # another worker already synced this revision of the CSV
+                self._swap(*cached)
+                self._cache_entry = key
+                return {"cached": key}
+
+            state = self._state
+            if csv_columns(csv_path) != state.records.columns:
+                # a schema change touches every row; rebuild from scratch
+                self._load(csv_path, key)
+                return {"added": len(self.records), "changed": 0, "removed": len(state.records)}
+
+            live = state.records.live_ids()
+            key_to_id = dict(zip(state.keys[live].tolist(),
+                                 zip(live.tolist(), state.digests[live].tolist())))
+            removed = set(live.tolist())
+            updated, added, seen = {}, [], {}
+            for record in iter_records(csv_path):
+                if self.shard and not self.owns(record):
+                    continue
+                known = key_to_id.get(row_digest(self.row_key(record, seen)))
+                if known is None:
+                    added.append(record)
+                    continue
+                row_id, digest = known
+                removed.discard(row_id)
+                if row_digest(record.values()) != digest:
+                    updated[row_id] = record
+            removed_ids, changed_ids = sorted(removed), list(updated)
+
+            if not (removed_ids or changed_ids or added):
+                self._cache_entry = key
+                return {"added": 0, "changed": 0, "removed": 0}
+
+            records = state.records.with_changes(removed_ids, updated, added)
+            added_ids = list(range(len(state.records), len(records)))
+            upsert_ids = changed_ids + added_ids
+
+            # copy-on-write: the live snapshot keeps reading the old matrix
+            spool = EmbeddingSpool(state.embeddings.shape[1])
+            for start in range(0, len(state.embeddings), INGEST_CHUNK_ROWS):
+                spool.write(state.embeddings[start:start + INGEST_CHUNK_ROWS])
+            spool.write(np.zeros((len(added_ids), spool.dim), dtype="float32"))
+            embeddings = spool.finalize()
+            for start in range(0, len(upsert_ids), INGEST_CHUNK_ROWS):
+                ids = upsert_ids[start:start + INGEST_CHUNK_ROWS]
+                embeddings[ids] = self.embedder.encode([self.row_text(records[i]) for i in ids])
+            if removed_ids:
+                embeddings[removed_ids] = 0.0
+
+            if supports_remove(state.index):
+                index = configure_search(writable_copy(state.index))
+                stale = np.array(removed_ids + changed_ids, dtype="int64")
+                if len(stale):
+                    index.remove_ids(stale)
+                if upsert_ids:
+                    ids = np.array(upsert_ids, dtype="int64")
+                    index.add_with_ids(np.ascontiguousarray(embeddings[ids]), ids)
+            else:
+                # re-insert the stored vectors; nothing is re-encoded
+                live = records.live_ids()
+                index = build_index(embeddings[live], live, self.index_type)
+
+            self._swap(*self._store(key, records, embeddings, index))
+            self._cache_entry = key
+            return {"added": len(added_ids), "changed": len(changed_ids),
+                    "removed": len(removed_ids)}
+
+    def _cache_lock(self, key):
+        return self.cache.lock(key) if self.cache else contextlib.nullcontext()
+
+    def _load_cached(self, key):
+        cached = self.cache.load(key) if self.cache else None
+        if cached is not None:
+            configure_search(cached[2])
+        return cached
+
+    def _store(self, key, records, embeddings, index):
+        """Persist a build and hand back the memory-mapped copy other workers will share."""
+        derived = self._derive(records)
+        if not self.cache:
+            return records, embeddings, index, derived
+        self.cache.save(key, records, embeddings, index, derived)
+        return self._load_cached(key) or (records, embeddings, index, derived)
+
+    def _derive(self, records):
+        """
+        Everything built from the rows besides embeddings: row key / content
+        digests, features and metadata masks, as arrays for the cache entry.
+        """
+        keys = np.zeros(len(records), dtype=np.uint64)
+        digests = np.zeros(len(records), dtype=np.uint64)
+        seen = {}
+        for row_id, record in enumerate(records):
+            if record is not None:
+                keys[row_id] = row_digest(self.row_key(record, seen))
+                digests[row_id] = row_digest(record.values())
+        features = self.feature_store.build(records) if self.feature_store else None
+        derived = {"keys": keys, "digests": digests}
+        derived.update({f"metadata.{name}": a
+                        for name, a in self.build_metadata(records, features).arrays().items()})
+        if features is not None:
+            derived.update({f"features.{name}": a for name, a in features.arrays().items()})
+        return derived
+
+    def _cache_key(self, csv_path):
+        shard = (shard_map.key(self.shard),) if self.shard else ()
+        return cache_key(csv_path, self.embedder.model_name, self.embedder.backend_key,
+                         build_key(self.index_type), self.text_builder.key(), *shard,
+                         scope=(self.shard, self.index_type) if self.shard else (self.index_type,))
+
+    def recall_check(self, k=10, sample=1000):
+        """recall@k of the configured index against exact flat search on the same rows."""
+        state = self._state
+        return recall_at_k(state.index, state.embeddings, state.records.live_ids(),
+                           k=k, sample=sample)
+
+    def _swap(self, records, embeddings, index, derived):
+        features = (self.feature_store.from_arrays(_section(derived, "features."))
+                    if self.feature_store else None)
+        metadata = MetadataIndex.from_arrays(_section(derived, "metadata."))
+        version = self._state.version + 1 if self._state else 1
+        self._state = IndexState(records, embeddings, index, derived["keys"], derived["digests"],
+                                 features, metadata, version)
+        for callback in self._swap_callbacks:
+            callback()
+
+    def on_swap(self, callback):
+        """Call ``callback()`` after every new snapshot is swapped in (load or refresh)."""
+        self._swap_callbacks.append(callback)
+
+    def watch(self, csv_path, interval=30.0):
+        """Poll ``csv_path`` and refresh incrementally whenever it changes."""
+        if self._watcher is not None:
+            return
+
+        def run(stop):
+            last = os.stat(csv_path).st_mtime_ns
+            while not stop.wait(interval):
+                try:
+                    mtime = os.stat(csv_path).st_mtime_ns
+                    if mtime != last:
+                        last = mtime
+                        print(f"[INFO] {csv_path} changed: {self.refresh(csv_path)}")
+                except Exception as exc:
+                    print(f"[WARN] refresh of {csv_path} failed: {exc}")
+
+        stop = threading.Event()
+        thread = threading.Thread(target=run, args=(stop,), daemon=True,
+                                  name=f"watch-{os.path.basename(csv_path)}")
+        self._watcher = (thread, stop)
+        thread.start()
+
+    def stop_watching(self):
+        if self._watcher is not None:
+            self._watcher[1].set()
+            self._watcher = None
+
+    def search(self, query_text, top_k=5, row_filter=None):
+        query_vec = self.embedder.encode_query(query_text)
+        return [(record, score) for _, record, score in
+                self.search_by_vector(query_vec, top_k, row_filter)]
+
+    def search_by_vector(self, query_vec, top_k=5, row_filter=None, state=None):
+        """Search with an already-encoded (1, dim) query; returns (row_id, record, score)."""
+        return self.search_by_vectors(query_vec, top_k, row_filter, state)[0]
+
+    def search_by_vectors(self, query_vecs, top_k=5, row_filter=None, state=None):
+        """
+        Multi-query search over an (n, dim) matrix; one hit list per query row.
+
+        ``row_filter`` (a metadata.RowFilter) is applied inside the FAISS
+        search, so only eligible rows compete for the top_k slots. ``state``
+        is the IndexState to search (default: the current one), so a request
+        that already holds one never mixes it with a newer swap.
+        """
+        state = state or self._state
+        mask = state.metadata.mask(row_filter) if row_filter is not None else None
+        if mask is None:
+            scores, indices = state.index.search(query_vecs, top_k)
+        elif not mask.any():
+            return [[] for _ in range(len(query_vecs))]
+        else:
+            params, _keepalive = search_params(state.index, mask)
+            scores, indices = state.index.search(query_vecs, top_k, params=params)
         results = []
-        for j, i in enumerate(indices[0]):
-            grant = self.grants[i]
-            score = float(scores[0][j])
-            results.append((grant, round(score, 3)))
+        for row_scores, row_ids in zip(scores, indices):
+            hits = []
+            for j, i in enumerate(row_ids):
+                if i < 0:
+                    continue
+                record = state.records[i]
+                score = float(row_scores[j])
+                hits.append((int(i), record, round(score, 3)))
+            results.append(hits)
         return results
 
 
+# ----------------- Grant Indexer -----------------
+class GrantIndexer(CsvIndexer):
+    key_fields = ("Grant Program Name", "Administering Agency")
+    text_fields = tuple(f.strip() for f in GRANT_TEXT_FIELDS.split(",") if f.strip()) or None
+    feature_store = GrantFeatureStore
+
+    def load_grants(self, csv_path):
+        self.load_csv(csv_path)
+
+    def refresh_grants(self, csv_path):
+        return self.refresh(csv_path)
+
+    def row_states(self, record):
+        # grants have no state column: use the states named anywhere in the row
+        return states_mentioned(" ".join(str(v) for v in record.values()).lower())
+
+    def build_metadata(self, records, features):
+        # same states as row_states, from the text the feature store already joined
+        states = []
+        for start in range(0, len(features), INGEST_CHUNK_ROWS):
+            states.extend(states_mentioned(text) if text is not None else None
+                          for text in features.text.slice(start, INGEST_CHUNK_ROWS).to_pylist())
+        return MetadataIndex(states, deadlines=features.deadlines)
+
+    @property
+    def grants(self):
+        return self.records
+
+
 # ----------------- Buyer Indexer -----------------
-class BuyerIndexer:
-    def __init__(self):
-        self.model = SentenceTransformer("BAAI/bge-base-en-v1.5")
-        self.index = None
-        self.buyers = []
+class BuyerIndexer(CsvIndexer):
+    key_fields = ("Agency Name",)
+    text_fields = tuple(f.strip() for f in BUYER_TEXT_FIELDS.split(",") if f.strip()) or None
 
     def load_buyers(self, csv_path):
-        df = pd.read_csv(csv_path, encoding="utf-8-sig").fillna("")
-        df.columns = df.columns.str.strip()
-        self.buyers = df.to_dict(orient="records")
+        self.load_csv(csv_path)
 
-        texts = [
-            " ".join(str(value) for value in row.values()) for row in self.buyers
-        ]
+    def refresh_buyers(self, csv_path):
+        return self.refresh(csv_path)
 
-        embeddings = self.model.encode(texts, convert_to_numpy=True, show_progress_bar=True)
-        embeddings = normalize_embeddings(embeddings)
+    @property
+    def buyers(self):
+        return self.records
 
-        dim = embeddings.shape[1]
-        self.index = faiss.IndexFlatIP(dim)
-        self.index.add(embeddings.astype("float32"))
 
-    def search(self, query_text, top_k=5):
-        query_vec = self.model.encode([query_text], convert_to_numpy=True)
-        query_vec = normalize_embeddings(query_vec)
-        scores, indices = self.index.search(query_vec.astype("float32"), top_k)
-        results = []
-        for j, i in enumerate(indices[0]):
-            buyer = self.buyers[i]
-            score = float(scores[0][j])
-            results.append((buyer, round(score, 3)))
-        return results
+# Instantiate globally
+buyer_indexer = BuyerIndexer(index_type=BUYER_INDEX_TYPE, shard=SHARD_NAME)
+grant_indexer = GrantIndexer(index_type=GRANT_INDEX_TYPE, shard=SHARD_NAME)
 
 
-# Instantiate globally
-buyer_indexer = BuyerIndexer()
-grant_indexer = GrantIndexer()
+if __name__ == "__main__":
+    # Prebuild the index cache (e.g. while building the image) so servers start warm.
+    if index_cache is None:
+        raise SystemExit("INDEX_CACHE_DIR is empty; nothing to prebuild into")
+    buyer_indexer.load_buyers(BUYERS_CSV)
+    grant_indexer.load_grants(GRANTS_CSV)
+    print(f"[INFO] Index cache ready in {index_cache.cache_dir}")
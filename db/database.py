@@ -1,4 +1,6 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
@@ -8,10 +10,54 @@ load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-engine = create_engine(DATABASE_URL)
+# Connection pool per process (sync and async engines each get one).
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") == "1"
+
+# Async drivers for the sync URLs we are configured with.
+ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "postgres": "postgresql+asyncpg",
+                 "sqlite": "sqlite+aiosqlite", "mysql": "mysql+aiomysql"}
+# Sync drivers swapped for their dialect's asyncio driver; async ones are kept.
+SYNC_DRIVERS = {"psycopg2", "psycopg", "pg8000", "pysqlite", "pymysql", "mysqldb"}
+ASYNC_DRIVER_NAMES = {"asyncpg", "psycopg_async", "aiosqlite", "aiomysql", "asyncmy"}
+
+# Set to use a different URL (or driver) for the async engine.
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL")
+
+
+def async_url(url):
+    """``DATABASE_URL`` with its driver swapped for the asyncio one."""
+    url = make_url(url)
+    dialect, _, driver = url.drivername.partition("+")
+    if driver in ASYNC_DRIVER_NAMES:
+        return url
+    if (not driver or driver in SYNC_DRIVERS) and dialect in ASYNC_DRIVERS:
+        return url.set(drivername=ASYNC_DRIVERS[dialect])
+    raise ValueError(f"No asyncio driver known for '{url.drivername}' in DATABASE_URL; "
+                     "set ASYNC_DATABASE_URL to a URL with an async driver")
+
+
+def pool_options(url):
+    """Pool sizing for server databases; SQLite keeps SQLAlchemy's default pool."""
+    options = {"pool_pre_ping": DB_POOL_PRE_PING}
+    if not make_url(url).drivername.startswith("sqlite"):
+        options.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW,
+                       pool_timeout=DB_POOL_TIMEOUT, pool_recycle=DB_POOL_RECYCLE)
+    return options
+
+
+engine = create_engine(DATABASE_URL, **pool_options(DATABASE_URL))
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = create_async_engine(async_url(ASYNC_DATABASE_URL or DATABASE_URL),
+                                   **pool_options(DATABASE_URL))
+
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False, autoflush=False)
+
 Base = declarative_base()
 
 def get_db():
@@ -20,3 +66,7 @@ def get_db():
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
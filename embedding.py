@@ -0,0 +1,253 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+from caching import LRUCache
+from config import (QUERY_CACHE_SIZE, EMBEDDING_BACKEND, EMBEDDING_ONNX_DIR,
+                    EMBEDDING_QUANT_CONFIG, EMBEDDING_THREADS)
+
+MODEL_NAME = "BAAI/bge-base-en-v1.5"
+BACKENDS = ("torch", "onnx", "onnx-int8")
+
+
+def normalize_embeddings(embeddings: np.ndarray) -> np.ndarray:
+    """Normalize embeddings so cosine similarity = inner product."""
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return embeddings / np.maximum(norms, 1e-12)
+
+
+def _onnx_kwargs():
+    import onnxruntime as ort
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = EMBEDDING_THREADS
+    return {"provider": "CPUExecutionProvider", "session_options": options}
+
+
+def load_model(model_name=MODEL_NAME, backend="torch"):
+    """
+    SentenceTransformer for ``backend`` (one of BACKENDS).
+
+    ``onnx`` runs the model's ONNX export under ONNX Runtime. ``onnx-int8``
+    dynamically quantizes that export for EMBEDDING_QUANT_CONFIG; the
+    quantized model is written to EMBEDDING_ONNX_DIR on first use and
+    reused afterwards. The ONNX backends need ``sentence-transformers[onnx]``.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend {backend!r}; expected one of {BACKENDS}")
+    # torch / sentence-transformers take seconds to import, so only pay for it on first encode
+    import torch
+    from sentence_transformers import SentenceTransformer
+    torch.set_num_threads(EMBEDDING_THREADS)
+    if backend == "torch":
+        return SentenceTransformer(model_name)
+    if backend == "onnx":
+        return SentenceTransformer(model_name, backend="onnx", model_kwargs=_onnx_kwargs())
+
+    local_dir = os.path.join(EMBEDDING_ONNX_DIR, model_name.replace("/", "__"))
+    # named explicitly: the exporter's default suffix follows the config's weight dtype
+    # (quint8 for avx2), which would not match the file looked up here
+    file_suffix = f"qint8_{EMBEDDING_QUANT_CONFIG}"
+    file_name = f"onnx/model_{file_suffix}.onnx"
+    if not os.path.exists(os.path.join(local_dir, file_name)):
+        from sentence_transformers import export_dynamic_quantized_onnx_model
+        print(f"[INFO] Exporting int8 ONNX model for {model_name} to {local_dir}")
+        model = SentenceTransformer(model_name, backend="onnx")
+        model.save(local_dir)
+        export_dynamic_quantized_onnx_model(model, EMBEDDING_QUANT_CONFIG, local_dir,
+                                            file_suffix=file_suffix)
+    return SentenceTransformer(local_dir, backend="onnx",
+                               model_kwargs={"file_name": file_name, **_onnx_kwargs()})
+
+
+# ----------------- Embedding Service -----------------
+class EmbeddingService:
+    """
+    One SentenceTransformer shared by every indexer.
+
+    The model is only constructed on first use, and single-query encodes
+    coming from concurrent requests are micro-batched into one forward pass.
+    Query vectors are kept in an LRU cache keyed on whitespace-normalized text.
+    ``backend`` selects the inference runtime (see ``load_model``).
+    """
+
+    def __init__(self, model_name=MODEL_NAME, max_batch_size=32, max_wait_ms=5.0,
+                 query_cache_size=QUERY_CACHE_SIZE, backend=EMBEDDING_BACKEND):
+        self.model_name = model_name
+        self.backend = backend
+        self.query_cache = LRUCache(query_cache_size)
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._model = None
+        self._model_lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+
+    @property
+    def backend_key(self) -> str:
+        """``backend`` plus the settings its vectors depend on (for index cache keys)."""
+        if self.backend == "onnx-int8":
+            return f"{self.backend}:{EMBEDDING_QUANT_CONFIG}"
+        return self.backend
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    self._model = load_model(self.model_name, self.backend)
+        return self._model
+
+    @model.setter
+    def model(self, model):
+        """Use an already-built encoder, e.g. a stub for offline benchmarks."""
+        with self._model_lock:
+            self._model = model
+
+    def encode(self, texts, show_progress_bar=False) -> np.ndarray:
+        """Encode a list of texts in one call and return normalized float32 vectors."""
+        embeddings = self.model.encode(list(texts), convert_to_numpy=True,
+                                       show_progress_bar=show_progress_bar)
+        return normalize_embeddings(embeddings).astype("float32")
+
+    def encode_query(self, text: str) -> np.ndarray:
+        """Encode one query through the micro-batcher; returns a (1, dim) array."""
+        key = " ".join(text.split())
+        cached = self.query_cache.get(key)
+        if cached is not None:
+            return cached
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((text, future))
+        vector = future.result()
+        vector.flags.writeable = False
+        self.query_cache.put(key, vector)
+        return vector
+
+    def encode_queries(self, texts) -> np.ndarray:
+        """
+        Encode many queries with one forward pass for the uncached ones.
+
+        Returns an (n, dim) array in input order.
+        """
+        keys = [" ".join(text.split()) for text in texts]
+        vectors = [self.query_cache.get(key) for key in keys]
+        missing = {}
+        for i, vector in enumerate(vectors):
+            if vector is None:
+                missing.setdefault(keys[i], texts[i])
+        if missing:
+            encoded = self.encode(list(missing.values()))
+            fresh = {}
+            for key, vector in zip(missing, encoded):
+                vector = vector[None, :]
+                vector.flags.writeable = False
+                fresh[key] = vector
+                self.query_cache.put(key, vector)
+            vectors = [v if v is not None else fresh[k] for k, v in zip(keys, vectors)]
+        return np.vstack(vectors)
+
+    # ---------------------------
+    # Micro-batching worker
+    # ---------------------------
+
+    def _ensure_worker(self):
+        if self._worker is not None:
+            return
+        with self._worker_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="embedding-batcher",
+                                                daemon=True)
+                self._worker.start()
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                vectors = self.encode([text for text, _ in batch])
+            except Exception as exc:
+                for _, future in batch:
+                    future.set_exception(exc)
+                continue
+            for i, (_, future) in enumerate(batch):
+                future.set_result(vectors[i:i + 1])
+
+
+# ----------------- Backend Parity -----------------
+def compare_backends(texts, candidate, reference="torch", queries=None, k=10, sample=200,
+                     model_name=MODEL_NAME, seed=0):
+    """
+    Check ``candidate`` backend against ``reference`` on the same texts.
+
+    Reports the cosine between each text's two embeddings, the largest
+    drift in query/row cosine scores, recall@k of the candidate's top-k
+    rows against the reference's for ``queries`` (default: a sample of
+    ``texts``), and encode throughput of both backends.
+    """
+    texts = list(texts)
+    if queries is None:
+        rng = np.random.default_rng(seed)
+        queries = [texts[i] for i in rng.choice(len(texts), min(sample, len(texts)), replace=False)]
+    k = min(k, len(texts))
+
+    runs = {}
+    for backend in (reference, candidate):
+        service = EmbeddingService(model_name, backend=backend, query_cache_size=0)
+        service.encode(texts[:8])  # load + warm up outside the timing
+        start = time.perf_counter()
+        corpus = service.encode(texts)
+        elapsed = time.perf_counter() - start
+        runs[backend] = (corpus, service.encode(queries), len(texts) / max(elapsed, 1e-9))
+
+    (ref_corpus, ref_queries, ref_rate), (cand_corpus, cand_queries, cand_rate) = (
+        runs[reference], runs[candidate])
+    row_cosine = np.sum(ref_corpus * cand_corpus, axis=1)
+    ref_scores, cand_scores = ref_queries @ ref_corpus.T, cand_queries @ cand_corpus.T
+    ref_top = np.argpartition(-ref_scores, k - 1, axis=1)[:, :k]
+    cand_top = np.argpartition(-cand_scores, k - 1, axis=1)[:, :k]
+    hits = sum(len(set(r) & set(c)) for r, c in zip(ref_top, cand_top))
+    return {"reference": reference, "candidate": candidate, "rows": len(texts),
+            "queries": len(queries), "k": k,
+            "cosine_mean": float(row_cosine.mean()), "cosine_min": float(row_cosine.min()),
+            "max_score_drift": float(np.abs(ref_scores - cand_scores).max()),
+            "recall_at_k": hits / (k * len(queries)),
+            "rows_per_s": {reference: ref_rate, candidate: cand_rate},
+            "speedup": cand_rate / ref_rate}
+
+
+# Shared by buyer_indexer and grant_indexer
+embedding_service = EmbeddingService()
+
+
+if __name__ == "__main__":
+    # python embedding.py <csv> <candidate backend> [reference backend] [--buyers]
+    import json
+    import sys
+    from data_loader import BuyerIndexer, GrantIndexer
+    from ingest import iter_records
+
+    args = [arg for arg in sys.argv[1:] if arg != "--buyers"]
+    indexer = BuyerIndexer if "--buyers" in sys.argv else GrantIndexer
+    # the indexed fields, untruncated: each backend cuts to the model window itself,
+    # and the text builder's budget would load the model only to count tokens
+    builder = indexer(cache=None).text_builder
+    rows = [" ".join(builder.parts(record)) for record in iter_records(args[0])]
+    print(json.dumps(compare_backends(rows, *args[1:3]), indent=2))
@@ -0,0 +1,225 @@
+import hashlib
+import re
+from array import array
+from datetime import datetime
+from functools import lru_cache
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+from keyword_index import KeywordIndex, KeywordIndexBuilder
+from config import INGEST_CHUNK_ROWS
+
+KEYWORD_FIELDS = ("Eligible Equipment/Expenses", "Purpose", "Focus Areas", "Eligible Applicants")
+
+US_STATES = (
+    "alabama", "alaska", "arizona", "arkansas", "california", "colorado", "connecticut",
+    "delaware", "florida", "georgia", "hawaii", "idaho", "illinois", "indiana", "iowa",
+    "kansas", "kentucky", "louisiana", "maine", "maryland", "massachusetts", "michigan",
+    "minnesota", "mississippi", "missouri", "montana", "nebraska", "nevada", "new hampshire",
+    "new jersey", "new mexico", "new york", "north carolina", "north dakota", "ohio",
+    "oklahoma", "oregon", "pennsylvania", "rhode island", "south carolina", "south dakota",
+    "tennessee", "texas", "utah", "vermont", "virginia", "washington", "west virginia",
+    "wisconsin", "wyoming", "district of columbia",
+)
+
+US_STATE_CODES = dict(zip(
+    ("al", "ak", "az", "ar", "ca", "co", "ct", "de", "fl", "ga", "hi", "id", "il", "in", "ia",
+     "ks", "ky", "la", "me", "md", "ma", "mi", "mn", "ms", "mo", "mt", "ne", "nv", "nh", "nj",
+     "nm", "ny", "nc", "nd", "oh", "ok", "or", "pa", "ri", "sc", "sd", "tn", "tx", "ut", "vt",
+     "va", "wa", "wv", "wi", "wy", "dc"),
+    US_STATES))
+
+# Longest names first so "west virginia" wins over "virginia"; word bounds keep
+# "kansas" from matching inside "arkansas".
+_STATE_RE = re.compile(r"\b(" + "|".join(sorted(US_STATES, key=len, reverse=True)) + r")\b")
+
+_STATE_SET = frozenset(US_STATES)
+_CELL_SPLIT = re.compile(r"[,;/]")
+
+_EPOCH = datetime(1970, 1, 1)
+_DAY = 86400.0
+
+
+def parse_deadline(deadline) -> float:
+    """Seconds since the (naive) epoch for a YYYY-MM-DD deadline, NaN if unparseable."""
+    try:
+        d = datetime.strptime(str(deadline).strip(), "%Y-%m-%d")
+    except ValueError:
+        return np.nan
+    return (d - _EPOCH).total_seconds()
+
+
+def days_left(deadlines, now=None) -> np.ndarray:
+    """Whole days from ``now`` until each parsed deadline (NaN where unparseable)."""
+    now = datetime.now() if now is None else now
+    return np.floor((deadlines - (now - _EPOCH).total_seconds()) / _DAY)
+
+
+def states_mentioned(text_lower: str) -> frozenset:
+    return frozenset(_STATE_RE.findall(text_lower))
+
+
+def normalize_state(value) -> str:
+    """Lowercased full state name for a name or two-letter code ("CA" → "california")."""
+    value = " ".join(str(value).lower().split())
+    return US_STATE_CODES.get(value, value)
+
+
+def states_in_cell(value) -> frozenset:
+    """States named by a State cell: names or two-letter codes, several split by , ; or /."""
+    states = frozenset(normalize_state(part) for part in _CELL_SPLIT.split(str(value)))
+    return (states & _STATE_SET) or states_mentioned(str(value).lower())
+
+
+@lru_cache(maxsize=1 << 16)
+def token_hash(token: str) -> int:
+    """Stable 64-bit id of a whitespace token (no vocabulary to keep per worker)."""
+    return int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def token_hashes(text_lower: str) -> np.ndarray:
+    """Sorted ids of the distinct whitespace tokens of ``text_lower``."""
+    return np.unique(np.fromiter(map(token_hash, set(text_lower.split())), dtype=np.uint64))
+
+
+def keyword_text(grant) -> str:
+    """The columns the keyword boost matches product / agency terms against."""
+    return " ".join(str(grant.get(f, "")) for f in KEYWORD_FIELDS)
+
+
+# ----------------- Grant Features -----------------
+class GrantFeatureStore:
+    """
+    Per-grant features built once per index cache entry, indexed by grant row id.
+
+    Everything is an array, so the store is saved with the cache entry and
+    memory-mapped by warm starts: the lowercased row text (Arrow strings),
+    its distinct whitespace tokens as sorted ``token_hash`` ids (one
+    ``token_offsets[g]:token_offsets[g + 1]`` slice of ``token_ids`` per
+    grant), parsed deadlines and the keyword index. Lexical overlap and geo
+    matching work on many grants per call, so no grant text is turned back
+    into Python strings while scoring. Deadlines stay a float array so decay
+    for any set of grants is one vectorized expression against the
+    request's "now".
+    """
+
+    def __init__(self, text, token_offsets, token_ids, deadlines, keywords):
+        self.text = text
+        self.token_offsets = token_offsets
+        self.token_ids = token_ids
+        self.deadlines = deadlines
+        self.keywords = keywords
+
+    @classmethod
+    def build(cls, records, chunk_rows=INGEST_CHUNK_ROWS):
+        """
+        Features of every row of ``records`` (``None`` rows are deleted ones).
+
+        One pass, since ``records`` may be a RecordStore that materializes
+        rows lazily. Texts and token ids are kept as Python objects for at
+        most ``chunk_rows`` rows before going into Arrow / numpy chunks.
+        """
+        text_chunks, token_chunks = [], []
+        texts, token_ids = [], []
+        token_counts, deadlines = array("q"), array("d")
+        keywords = KeywordIndexBuilder()
+        for g in records:
+            if g is None:
+                texts.append(None)
+                token_counts.append(0)
+                deadlines.append(np.nan)
+                keywords.add(None)
+            else:
+                text = " ".join(str(v) for v in g.values()).lower()
+                tokens = token_hashes(text)
+                texts.append(text)
+                token_ids.append(tokens)
+                token_counts.append(len(tokens))
+                deadlines.append(parse_deadline(g.get("Application Deadline", "")))
+                keywords.add(keyword_text(g))
+            if len(texts) == chunk_rows:
+                text_chunks.append(pa.array(texts, pa.large_string()))
+                token_chunks.append(np.concatenate(token_ids or [np.empty(0, np.uint64)]))
+                texts, token_ids = [], []
+        text_chunks.append(pa.array(texts, pa.large_string()))
+        token_chunks.append(np.concatenate(token_ids or [np.empty(0, np.uint64)]))
+
+        offsets = np.zeros(len(token_counts) + 1, dtype=np.int64)
+        np.cumsum(np.frombuffer(token_counts, dtype=np.int64), out=offsets[1:])
+        return cls(pa.concat_arrays(text_chunks), offsets, np.concatenate(token_chunks),
+                   np.frombuffer(deadlines, dtype=np.float64), keywords.build())
+
+    def arrays(self) -> dict:
+        return {"text": self.text, "token_offsets": self.token_offsets,
+                "token_ids": self.token_ids, "deadlines": self.deadlines,
+                **{f"keywords.{name}": a for name, a in self.keywords.arrays().items()}}
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        keywords = {name[len("keywords."):]: a for name, a in arrays.items()
+                    if name.startswith("keywords.")}
+        return cls(arrays["text"], arrays["token_offsets"], arrays["token_ids"],
+                   arrays["deadlines"], KeywordIndex.from_arrays(keywords))
+
+    def __len__(self):
+        return len(self.deadlines)
+
+    @property
+    def token_counts(self) -> np.ndarray:
+        """Distinct whitespace tokens per grant."""
+        return np.diff(self.token_offsets)
+
+    def token_overlap(self, grant_ids, queries, owners) -> np.ndarray:
+        """
+        Jaccard overlap of each grant's token set with ``queries[owners[i]]``.
+
+        ``queries`` are ``token_hashes`` arrays (one per buyer); all pairs are
+        scored in one pass over the grants' token slices.
+        """
+        grant_ids = np.asarray(grant_ids, dtype=np.int64)
+        starts = self.token_offsets[grant_ids]
+        sizes = self.token_offsets[grant_ids + 1] - starts
+        # every grant's slice of token_ids, back to back
+        ends = np.cumsum(sizes)
+        positions = np.arange(ends[-1] if len(ends) else 0) + np.repeat(starts - ends + sizes, sizes)
+        grant_tokens = self.token_ids[positions]
+
+        # exact (query, token) keys: tokens are numbered within the union of the queries
+        vocab = np.unique(np.concatenate(queries)) if len(queries) else np.empty(0, np.uint64)
+        pairs = np.repeat(np.arange(len(grant_ids)), sizes)
+        shared = np.zeros(len(grant_ids))
+        if len(vocab) and len(grant_tokens):
+            # most grant tokens are in no query: screen them on their low bits first
+            seen = np.zeros(1 << 16, dtype=bool)
+            seen[(vocab & 0xFFFF).astype(np.intp)] = True
+            maybe = np.flatnonzero(seen[(grant_tokens & 0xFFFF).astype(np.intp)])
+            grant_tokens, pairs = grant_tokens[maybe], pairs[maybe]
+            query_keys = np.concatenate([j * len(vocab) + np.searchsorted(vocab, q)
+                                         for j, q in enumerate(queries)])
+            ranks = np.minimum(np.searchsorted(vocab, grant_tokens), len(vocab) - 1)
+            keys = np.asarray(owners, dtype=np.int64)[pairs] * len(vocab) + ranks
+            found = np.minimum(np.searchsorted(query_keys, keys), len(query_keys) - 1)
+            hits = (vocab[ranks] == grant_tokens) & (query_keys[found] == keys)
+            shared = np.bincount(pairs, weights=hits, minlength=len(grant_ids))
+        query_sizes = np.array([len(q) for q in queries], dtype=np.int64)[
+            np.asarray(owners, dtype=np.int64)]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where((sizes > 0) & (query_sizes > 0),
+                            shared / (query_sizes + sizes - shared), 0.0)
+
+    def mentions(self, grant_ids, text_lower) -> np.ndarray:
+        """Whether each grant's lowercased text contains ``text_lower`` (False for deleted rows)."""
+        found = pc.match_substring(self.text.take(pa.array(grant_ids, pa.int64())), text_lower)
+        return found.fill_null(False).to_numpy(zero_copy_only=False)
+
+    def deadline_decay(self, grant_ids, now=None) -> np.ndarray:
+        """
+        Higher score when the deadline is closer (exponential decay).
+
+        Passed deadlines score 0.0 and unparseable ones 0.5.
+        """
+        deadlines = self.deadlines[np.asarray(grant_ids, dtype=np.int64)]
+        days = days_left(deadlines, now)
+        with np.errstate(invalid="ignore"):
+            decay = np.where(days <= 0, 0.0, np.exp(-days / 120))
+        return np.where(np.isnan(deadlines), 0.5, decay)
@@ -0,0 +1,127 @@
+import fcntl
+import hashlib
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+import faiss
+import numpy as np
+import pyarrow as pa
+
+from config import INDEX_CACHE_DIR, INDEX_MMAP
+from records import RecordStore
+
+# Zero-copy mapped reads need FAISS >= 1.10; older builds read the index into RAM.
+MMAP_FLAGS = (faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY
+              if hasattr(faiss, "IO_FLAG_MMAP_IFC") else 0)
+
+# Bump when the way rows are turned into embedding text (or the entry layout) changes.
+CACHE_VERSION = "7"
+
+
+def cache_key(csv_path, *parts, scope=()) -> str:
+    """
+    Hash of the CSV bytes plus anything else the embeddings depend on (model name, ...).
+
+    ``scope`` (shard, index type) is part of the readable key prefix as well:
+    entries are locked and pruned per prefix, so indexes of one CSV that
+    live side by side in a cache directory don't evict each other.
+    """
+    digest = hashlib.sha256()
+    with open(csv_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    for part in (CACHE_VERSION, *parts, *scope):
+        digest.update(b"\0" + str(part).encode("utf-8"))
+    prefix = ".".join((Path(csv_path).stem, *map(str, scope)))
+    return f"{prefix}-{digest.hexdigest()[:20]}"
+
+
+# ----------------- Index Cache -----------------
+class IndexCache:
+    """
+    On-disk cache of (records, normalized embeddings, FAISS index, derived
+    arrays) per CSV.
+
+    Records are an Arrow IPC file and embeddings a .npy; both are opened
+    memory-mapped, so a warm start does not re-encode or even fully read them.
+    With ``mmap`` the FAISS index is mapped read-only as well, so worker
+    processes serving the same entry share one copy through the page cache.
+    ``derived`` maps names to the per-row arrays built from the records (row
+    key digests, features, metadata masks): numpy arrays are stored as .npy,
+    Arrow arrays as IPC files, and both are mapped back on load.
+    """
+
+    def __init__(self, cache_dir, mmap=True):
+        self.cache_dir = Path(cache_dir)
+        self.mmap = mmap
+
+    @contextmanager
+    def lock(self, key):
+        """Cross-process lock per key prefix, so concurrent workers build or refresh it once."""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        stem = key.rsplit("-", 1)[0]
+        with open(self.cache_dir / f".{stem}.lock", "w") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def load(self, key):
+        entry = self.cache_dir / key
+        try:
+            table = pa.ipc.open_file(pa.memory_map(str(entry / "records.arrow"))).read_all()
+            records = RecordStore(table, np.load(entry / "rows.npy"))
+            embeddings = np.load(entry / "embeddings.npy", mmap_mode="r")
+            index = faiss.read_index(str(entry / "index.faiss"), MMAP_FLAGS if self.mmap else 0)
+            derived = {}
+            for path in (entry / "derived").iterdir():
+                if path.suffix == ".npy":
+                    derived[path.stem] = np.load(path, mmap_mode="r")
+                else:
+                    column = pa.ipc.open_file(pa.memory_map(str(path))).read_all().column(0)
+                    # one chunk is served straight from the mapping; combining would copy it
+                    derived[path.stem] = (column.chunk(0) if column.num_chunks == 1
+                                          else column.combine_chunks())
+        except (OSError, ValueError, pa.ArrowInvalid, RuntimeError):
+            return None
+        return records, embeddings, index, derived
+
+    def save(self, key, records, embeddings, index, derived):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp = Path(tempfile.mkdtemp(dir=self.cache_dir, prefix=".tmp-"))
+        try:
+            with pa.OSFile(str(tmp / "records.arrow"), "wb") as sink:
+                with pa.ipc.new_file(sink, records.table.schema) as writer:
+                    writer.write_table(records.table)
+            np.save(tmp / "rows.npy", records.rows)
+            np.save(tmp / "embeddings.npy", embeddings)
+            faiss.write_index(index, str(tmp / "index.faiss"))
+            (tmp / "derived").mkdir()
+            for name, array in derived.items():
+                if isinstance(array, np.ndarray):
+                    np.save(tmp / "derived" / f"{name}.npy", array)
+                    continue
+                table = pa.table({"value": array})
+                with pa.OSFile(str(tmp / "derived" / f"{name}.arrow"), "wb") as sink:
+                    with pa.ipc.new_file(sink, table.schema) as writer:
+                        writer.write_table(table)
+            entry = self.cache_dir / key
+            shutil.rmtree(entry, ignore_errors=True)
+            os.replace(tmp, entry)
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+        self._prune(key)
+
+    def _prune(self, key):
+        """Drop stale entries built from earlier versions of the same CSV (and scope)."""
+        stem = key.rsplit("-", 1)[0]
+        for entry in self.cache_dir.iterdir():
+            if entry.name != key and entry.name.rsplit("-", 1)[0] == stem:
+                shutil.rmtree(entry, ignore_errors=True)
+
+
+index_cache = IndexCache(INDEX_CACHE_DIR, INDEX_MMAP) if INDEX_CACHE_DIR else None
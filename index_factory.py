@@ -0,0 +1,142 @@
+import math
+import time
+import faiss
+import numpy as np
+
+from config import INDEX_NLIST, INDEX_NPROBE, INDEX_EF_SEARCH, INDEX_HNSW_M, INDEX_PQ_M
+
+INDEX_TYPES = ("flat", "ivf", "hnsw", "ivfpq", "ivfsq8")
+
+# Below this many rows the clustering/PQ training is not worth it (and FAISS
+# warns about too few training points), so approximate types fall back to flat.
+MIN_TRAIN_ROWS = {"ivf": 1000, "ivfsq8": 1000, "ivfpq": 10000, "hnsw": 0, "flat": 0}
+
+# Training uses a random sample of at most this many vectors, and vectors are
+# added in slices, so building from a memmap never loads the whole matrix.
+MAX_TRAIN_ROWS = 100_000
+ADD_BATCH_ROWS = 50_000
+
+
+def default_nlist(n_rows: int) -> int:
+    """~4·sqrt(n) inverted lists, keeping at least 39 training points per list."""
+    return max(1, min(int(4 * math.sqrt(n_rows)), n_rows // 39))
+
+
+def default_pq_m(dim: int) -> int:
+    """Largest sub-quantizer count ≤ dim/8 that divides dim (96 bytes/vector for 768-d)."""
+    for m in range(max(1, dim // 8), 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+
+def build_key(index_type) -> str:
+    """
+    ``index_type`` plus the build settings its index depends on (for index
+    cache keys). Query-time knobs (nprobe, efSearch) are applied on load and
+    stay out.
+    """
+    settings = {"hnsw": (INDEX_HNSW_M,), "ivf": (INDEX_NLIST,), "ivfsq8": (INDEX_NLIST,),
+                "ivfpq": (INDEX_NLIST, INDEX_PQ_M)}.get(index_type, ())
+    return "|".join(map(str, (index_type, *settings)))
+
+
+def build_index(embeddings, ids, index_type="flat"):
+    """
+    Build an ID-mapped inner-product index over ``embeddings`` (n, dim).
+
+    ``index_type`` is one of INDEX_TYPES: exact ``flat``, ``ivf`` (IVF-Flat),
+    ``hnsw``, or the compressed ``ivfpq`` / ``ivfsq8``. IVF/PQ variants are
+    trained on a sample of the vectors being added. ``embeddings`` may be a
+    memmap; it is read in slices.
+
+    IVF indexes keep ``ids`` in their inverted lists themselves. Flat and
+    HNSW are wrapped in an IndexIDMap2; an IDMap over IVF would compact its
+    id table on ``remove_ids`` while the lists keep the old positions.
+    """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type {index_type!r}; expected one of {INDEX_TYPES}")
+    n, dim = embeddings.shape
+    if n < MIN_TRAIN_ROWS[index_type]:
+        index_type = "flat"
+
+    ip = faiss.METRIC_INNER_PRODUCT
+    if index_type == "flat":
+        base = faiss.IndexFlatIP(dim)
+    elif index_type == "hnsw":
+        base = faiss.IndexHNSWFlat(dim, INDEX_HNSW_M, ip)
+        base.hnsw.efConstruction = max(40, 2 * INDEX_HNSW_M)
+    else:
+        nlist = INDEX_NLIST or default_nlist(n)
+        quantizer = faiss.IndexFlatIP(dim)
+        if index_type == "ivf":
+            base = faiss.IndexIVFFlat(quantizer, dim, nlist, ip)
+        elif index_type == "ivfsq8":
+            base = faiss.IndexIVFScalarQuantizer(quantizer, dim, nlist,
+                                                 faiss.ScalarQuantizer.QT_8bit, ip)
+        else:
+            base = faiss.IndexIVFPQ(quantizer, dim, nlist, INDEX_PQ_M or default_pq_m(dim), 8, ip)
+        sample = np.sort(np.random.default_rng(0).choice(n, min(n, MAX_TRAIN_ROWS), replace=False))
+        base.train(np.ascontiguousarray(embeddings[sample], dtype="float32"))
+
+    index = base if isinstance(base, faiss.IndexIVF) else faiss.IndexIDMap2(base)
+    ids = np.asarray(ids, dtype="int64")
+    for start in range(0, n, ADD_BATCH_ROWS):
+        stop = start + ADD_BATCH_ROWS
+        index.add_with_ids(np.ascontiguousarray(embeddings[start:stop], dtype="float32"),
+                           ids[start:stop])
+    configure_search(index)
+    return index
+
+
+def configure_search(index, nprobe=INDEX_NPROBE, ef_search=INDEX_EF_SEARCH):
+    """Apply query-time knobs (IVF nprobe, HNSW efSearch) to an index."""
+    base = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else index
+    if isinstance(base, faiss.IndexIVF):
+        base.nprobe = nprobe
+    elif isinstance(base, faiss.IndexHNSW):
+        base.hnsw.efSearch = ef_search
+    return index
+
+
+def supports_remove(index) -> bool:
+    """HNSW graphs can't delete vectors; those indexes are rebuilt on refresh."""
+    base = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else index
+    return not isinstance(base, faiss.IndexHNSW)
+
+
+def writable_copy(index):
+    """Private in-RAM copy to mutate; ``clone_index`` would keep a read-only mmap's storage."""
+    return faiss.deserialize_index(faiss.serialize_index(index))
+
+
+def recall_at_k(index, embeddings, ids, queries=None, k=10, sample=1000, seed=0):
+    """
+    Compare ``index`` against an exact flat baseline over the same vectors.
+
+    ``queries`` default to a random sample of the indexed vectors. Returns
+    recall@k (share of exact top-k ids also returned) and mean per-query
+    latency in milliseconds for both indexes.
+    """
+    embeddings = np.ascontiguousarray(embeddings, dtype="float32")
+    ids = np.asarray(ids, dtype="int64")
+    if queries is None:
+        rng = np.random.default_rng(seed)
+        pick = rng.choice(len(ids), size=min(sample, len(ids)), replace=False)
+        queries = embeddings[ids[pick]]
+    queries = np.ascontiguousarray(queries, dtype="float32")
+
+    exact = faiss.IndexIDMap2(faiss.IndexFlatIP(embeddings.shape[1]))
+    exact.add_with_ids(embeddings[ids], ids)
+
+    def timed(idx):
+        start = time.perf_counter()
+        _, found = idx.search(queries, k)
+        return found, (time.perf_counter() - start) * 1000 / len(queries)
+
+    truth, exact_ms = timed(exact)
+    found, approx_ms = timed(index)
+    hits = sum(len(set(t[t >= 0]) & set(f[f >= 0])) for t, f in zip(truth, found))
+    total = sum(int((t >= 0).sum()) for t in truth)
+    return {"recall_at_k": hits / max(total, 1), "k": k, "queries": len(queries),
+            "latency_ms": approx_ms, "flat_latency_ms": exact_ms}
@@ -0,0 +1,71 @@
+import asyncio
+import functools
+import math
+import multiprocessing
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from config import MATCH_WORKERS, MATCH_QUEUE_SIZE
+
+
+class PoolSaturated(Exception):
+    """Raised when the pool already holds as many jobs as it may run plus queue."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"inference pool saturated, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+# ----------------- Inference Pool -----------------
+class InferencePool:
+    """
+    Dedicated, bounded worker pool for embedding + scoring work.
+
+    At most ``max_workers`` jobs run and ``max_queue`` wait; anything beyond
+    that is rejected immediately with a retry hint instead of queueing
+    without limit on FastAPI's shared threadpool.
+
+    With ``processes`` the jobs run in spawned worker processes instead of
+    threads, for CPU-bound work that holds the GIL (e.g. password hashing);
+    ``fn`` and its arguments must then be picklable.
+    """
+
+    def __init__(self, max_workers=MATCH_WORKERS, max_queue=MATCH_QUEUE_SIZE, processes=False):
+        self.max_workers = max_workers
+        self.capacity = max_workers + max_queue
+        if processes:
+            # spawn, not fork: the parent runs FAISS / tokenizer threads
+            self._executor = ProcessPoolExecutor(max_workers=max_workers,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="match")
+        self._pending = 0
+        self._avg_seconds = 0.5  # EWMA of job duration, seeds the first retry hints
+
+    @property
+    def pending(self):
+        return self._pending
+
+    def retry_after(self) -> int:
+        """Seconds until roughly one queue's worth of work has drained."""
+        waves = self._pending / self.max_workers
+        return max(1, math.ceil(waves * self._avg_seconds))
+
+    async def run(self, fn, *args, **kwargs):
+        # Only touched from the event loop thread, so no lock is needed.
+        if self._pending >= self.capacity:
+            raise PoolSaturated(self.retry_after())
+        self._pending += 1
+        start = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+        finally:
+            self._pending -= 1
+            self._avg_seconds = 0.9 * self._avg_seconds + 0.1 * (time.perf_counter() - start)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+match_pool = InferencePool()
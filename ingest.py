@@ -0,0 +1,92 @@
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from config import INDEX_CACHE_DIR, INGEST_CHUNK_ROWS
+from records import RecordStore
+
+
+def iter_csv_chunks(csv_path, chunk_rows=INGEST_CHUNK_ROWS):
+    """DataFrames of at most ``chunk_rows`` rows; every cell is a string, blanks are ""."""
+    reader = pd.read_csv(csv_path, encoding="utf-8-sig", dtype=str, chunksize=chunk_rows)
+    for df in reader:
+        df = df.fillna("")
+        df.columns = df.columns.str.strip()
+        yield df
+
+
+def iter_records(csv_path, chunk_rows=INGEST_CHUNK_ROWS):
+    """Row dicts streamed chunk by chunk."""
+    for df in iter_csv_chunks(csv_path, chunk_rows):
+        yield from df.to_dict(orient="records")
+
+
+def csv_columns(csv_path):
+    return list(pd.read_csv(csv_path, encoding="utf-8-sig", nrows=0).columns.str.strip())
+
+
+# ----------------- Embedding Spool -----------------
+class EmbeddingSpool:
+    """
+    Append-only float32 matrix written to a temp file, opened as a memmap at
+    the end, so embeddings never have to sit in RAM all at once.
+    """
+
+    def __init__(self, dim=None):
+        self.dim = dim
+        self.rows = 0
+        spool_dir = INDEX_CACHE_DIR or None
+        if spool_dir:
+            os.makedirs(spool_dir, exist_ok=True)
+        self._file = tempfile.NamedTemporaryFile(dir=spool_dir, prefix=".spool-", delete=False)
+
+    def write(self, vectors):
+        vectors = np.ascontiguousarray(vectors, dtype="float32")
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+        self._file.write(vectors.tobytes())
+        self.rows += len(vectors)
+
+    def finalize(self):
+        """Writable (rows, dim) memmap; the temp file is unlinked once mapped."""
+        self._file.close()
+        try:
+            if self.rows == 0:
+                return np.zeros((0, self.dim or 0), dtype="float32")
+            return np.memmap(self._file.name, dtype="float32", mode="r+",
+                             shape=(self.rows, self.dim))
+        finally:
+            os.unlink(self._file.name)
+
+
+def ingest_csv(csv_path, row_text, embedder, chunk_rows=INGEST_CHUNK_ROWS, label=None,
+               keep=None):
+    """
+    Stream ``csv_path`` in chunks: keep each chunk as an Arrow record batch,
+    embed its rows and spool the vectors to disk, reporting progress as it goes.
+    With ``keep`` only the rows it returns true for are ingested.
+
+    Returns ``(RecordStore, embeddings memmap)``.
+    """
+    label = label or os.path.basename(csv_path)
+    batches, spool = [], EmbeddingSpool()
+    start = time.perf_counter()
+    for df in iter_csv_chunks(csv_path, chunk_rows):
+        records = df.to_dict(orient="records")
+        if keep is not None:
+            kept = [keep(record) for record in records]
+            records = [record for record, k in zip(records, kept) if k]
+            if not records:
+                continue
+            df = df[kept].reset_index(drop=True)
+        batches.append(pa.RecordBatch.from_pandas(df, preserve_index=False))
+        texts = [row_text(record) for record in records]
+        spool.write(embedder.encode(texts))
+        elapsed = time.perf_counter() - start
+        print(f"[INFO] {label}: {spool.rows} rows embedded "
+              f"({spool.rows / max(elapsed, 1e-9):.0f} rows/s)")
+    return RecordStore.from_batches(batches, csv_columns(csv_path)), spool.finalize()
@@ -0,0 +1,162 @@
+import re
+from array import array
+from functools import lru_cache
+
+import numpy as np
+import pyarrow as pa
+
+# Longest grant phrase a spacing variant is matched against ("bodyarmor" ↔ "body armor").
+MAX_JOINED = 4
+
+# Match strengths, on the same 0–1 scale as the old fuzzy keyword similarity
+EXACT, STEMMED, JOINED = 1.0, 0.95, 0.9
+
+_SPLIT = re.compile(r"[^a-z0-9]+")
+
+
+def tokenize(text: str):
+    """Lowercase and split on anything that isn't a letter/digit (hyphens, slashes, ...)."""
+    return [t for t in _SPLIT.split(str(text).lower()) if t]
+
+
+def stem(token: str) -> str:
+    """Very small plural stripper: radios → radio, batteries → battery, boxes → box."""
+    if len(token) > 3:
+        if token.endswith("ies"):
+            return token[:-3] + "y"
+        if token.endswith(("ses", "xes", "ches", "shes")):
+            return token[:-2]
+        if token.endswith("s") and not token.endswith(("ss", "us")):
+            return token[:-1]
+    return token
+
+
+# ----------------- Keyword Index -----------------
+class KeywordIndex:
+    """
+    Positional inverted index over each grant's keyword text.
+
+    Every grant's keyword text (Eligible Equipment/Expenses, Purpose, Focus
+    Areas, Eligible Applicants) is one slice ``offsets[g]:offsets[g + 1]`` of
+    the ``tokens`` / ``stems`` word-id arrays; ``positions`` lists where each
+    stem occurs, grouped by stem id (``stem_starts``). A term matches a grant
+    when it occurs as a whole-token phrase, tolerating plurals (``STEMMED``)
+    and spacing/hyphenation differences like "body-armor" / "bodyarmor"
+    (``JOINED``); phrases are checked against the token arrays at lookup
+    time instead of indexing every n-gram. Lookups are memoized per term.
+    """
+
+    ARRAYS = ("offsets", "tokens", "stems", "positions", "stem_starts")
+
+    def __init__(self, vocab, offsets, tokens, stems, positions, stem_starts):
+        self.vocab = vocab
+        self.offsets = offsets
+        self.tokens = tokens
+        self.stems = stems
+        self.positions = positions
+        self.stem_starts = stem_starts
+        self._ids = {word: i for i, word in enumerate(vocab)}
+        self.lookup = lru_cache(maxsize=4096)(self._lookup)
+
+    def arrays(self) -> dict:
+        return {"vocab": pa.array(self.vocab, pa.string()),
+                **{name: getattr(self, name) for name in self.ARRAYS}}
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        return cls(arrays["vocab"].to_pylist(), *(arrays[name] for name in cls.ARRAYS))
+
+    @classmethod
+    def from_texts(cls, texts):
+        """Index one keyword text per grant id (``None`` for deleted rows)."""
+        builder = KeywordIndexBuilder()
+        for text in texts:
+            builder.add(text)
+        return builder.build()
+
+    def _phrase(self, words):
+        """Start positions of the stem phrase ``words`` that lie within one grant's text."""
+        ids = [self._ids.get(w) for w in words]
+        if None in ids:
+            return np.empty(0, dtype=np.int64)
+        n = len(ids)
+        pos = self.positions[self.stem_starts[ids[0]]:self.stem_starts[ids[0] + 1]].astype(np.int64)
+        pos = pos[pos + n <= len(self.stems)]
+        for j, word_id in enumerate(ids[1:], 1):
+            pos = pos[self.stems[pos + j] == word_id]
+        return pos[pos + n <= self.offsets[self._grants_at(pos) + 1]]
+
+    def _grants_at(self, pos):
+        return np.searchsorted(self.offsets, pos, side="right") - 1
+
+    def _splits(self, word, parts=MAX_JOINED):
+        """Ways to cut ``word`` into 2..``parts`` indexed words ("bodyarmor" → body + armor)."""
+        for i in range(1, len(word)):
+            head, tail = word[:i], word[i:]
+            if head not in self._ids:
+                continue
+            if tail in self._ids:
+                yield [head, tail]
+            if parts > 2:
+                for rest in self._splits(tail, parts - 1):
+                    yield [head] + rest
+
+    def _lookup(self, term: str) -> dict:
+        """Map of grant_id → match strength for one keyword term."""
+        raw = tokenize(term)
+        if not raw:
+            return {}
+        stems = [stem(t) for t in raw]
+        concat = "".join(stems)
+
+        hits = {}
+        # spacing: "body armor" ↔ "bodyarmor"
+        for words in self._splits(concat):
+            hits.update(dict.fromkeys(self._grants_at(self._phrase(words)).tolist(), JOINED))
+        if len(stems) > 1:
+            hits.update(dict.fromkeys(self._grants_at(self._phrase([concat])).tolist(), JOINED))
+
+        pos = self._phrase(stems)
+        hits.update(dict.fromkeys(self._grants_at(pos).tolist(), STEMMED))
+        raw_ids = [self._ids.get(t) for t in raw]
+        if None not in raw_ids:
+            for j, word_id in enumerate(raw_ids):
+                pos = pos[self.tokens[pos + j] == word_id]
+            hits.update(dict.fromkeys(self._grants_at(pos).tolist(), EXACT))
+        return hits
+
+
+class KeywordIndexBuilder:
+    """
+    Builds a ``KeywordIndex`` one grant text at a time.
+
+    Word ids go straight into typed ``array`` buffers (4 bytes per token
+    instead of a Python int object), so building for a large corpus only
+    holds the vocabulary as Python objects.
+    """
+
+    def __init__(self):
+        self._ids = {}
+        self._stem_ids = {}  # word → id of its stem, so each distinct word is stemmed once
+        self._offsets = array("q", [0])
+        self._tokens = array("i")
+        self._stems = array("i")
+
+    def add(self, text):
+        """Append the next grant's keyword text (``None`` for a deleted row)."""
+        ids, stem_ids = self._ids, self._stem_ids
+        tokens = tokenize(text) if text is not None else ()
+        self._tokens.extend([ids.setdefault(token, len(ids)) for token in tokens])
+        for token in tokens:
+            if token not in stem_ids:
+                stem_ids[token] = ids.setdefault(stem(token), len(ids))
+        self._stems.extend([stem_ids[token] for token in tokens])
+        self._offsets.append(len(self._tokens))
+
+    def build(self) -> KeywordIndex:
+        stems = np.frombuffer(self._stems, dtype=np.intc).astype(np.int32, copy=False)
+        positions = np.argsort(stems, kind="stable").astype(np.int32)
+        stem_starts = np.searchsorted(stems[positions], np.arange(len(self._ids) + 1))
+        return KeywordIndex(list(self._ids), np.frombuffer(self._offsets, dtype=np.int64),
+                            np.frombuffer(self._tokens, dtype=np.intc).astype(np.int32, copy=False),
+                            stems, positions, stem_starts)
@@ -1,10 +1,35 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+import base64
+import binascii
+import json
+import time
+from fastapi import FastAPI, HTTPException, Header, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List
+from fastapi.responses import StreamingResponse, PlainTextResponse, JSONResponse
+from typing import List, Optional
 from models import SalesRepDropdownInput, GrantMatch
 from data_loader import buyer_indexer, grant_indexer
-from match_engine import get_ranked_matches_cosine
-from auth.routes import router as auth_router
+from match_engine import get_ranked_matches_cosine, get_ranked_matches_batch, cache_stats
+from metrics import (registry, Gauge, REQUEST_SECONDS, REQUESTS_TOTAL, collect_timings,
+                     server_timing)
+from auth.routes import router as auth_router, hash_pool
+from db.database import async_engine
+from precompute import buyer_grant_neighbors
+from inference_pool import match_pool, PoolSaturated
+from serialization import dumps
+from sharding import ShardRouter, ShardError
+from config import (DATA_WATCH_INTERVAL, BATCH_CHUNK_SIZE, BUYERS_CSV, GRANTS_CSV,
+                    LOAD_IN_BACKGROUND, MATCH_MAX_LIMIT, SHARD_NAME)
+
+# Seconds clients are told to wait while the indexes are still warming up.
+WARMING_RETRY_AFTER = 5
+
+# "starting" -> "ready", or "failed" with the error; read by /ready and /match.
+readiness = {"state": "starting", "error": None, "seconds": None}
+
+# Set when SHARD_NODES is configured: this process holds no indexes and routes
+# /match to the shard nodes instead.
+shard_router = ShardRouter.from_config()
 
 app = FastAPI()
 
@@ -19,13 +44,243 @@ app.add_middleware(
 
 app.include_router(auth_router)
 
+registry.register(Gauge(
+    "waynova_cache", "Query-embedding / result cache counters and sizes.", ("cache", "field"),
+    lambda: {(cache, field): value for cache, stats in cache_stats().items()
+             for field, value in stats.items()}))
+registry.register(Gauge(
+    "waynova_match_pool_pending", "Jobs running or queued in the match pool.", (),
+    lambda: {(): match_pool.pending}))
+registry.register(Gauge(
+    "waynova_index_rows", "Vectors in each FAISS index.", ("index",),
+    lambda: {(name,): idx.index.ntotal if idx.index is not None else 0
+             for name, idx in (("buyers", buyer_indexer), ("grants", grant_indexer))}))
+registry.register(Gauge(
+    "waynova_embed_text_tokens", "Token counts of the row texts embedded so far.",
+    ("index", "stat"),
+    lambda: {(name, stat): value
+             for name, idx in (("buyers", buyer_indexer), ("grants", grant_indexer))
+             for stat, value in idx.text_builder.stats().items()}))
+registry.register(Gauge(
+    "waynova_ready", "1 once indexes and the model are loaded.", (),
+    lambda: {(): int(readiness["state"] == "ready")}))
+
+
+def load_indexes():
+    """
+    Load both indexes (from the index cache when prebuilt), precompute
+    neighbours and warm the query model; flips ``readiness`` when done.
+    """
+    start = time.perf_counter()
+    try:
+        buyer_indexer.load_buyers(BUYERS_CSV)
+        grant_indexer.load_grants(GRANTS_CSV)
+        buyer_grant_neighbors.build()
+        buyer_indexer.embedder.encode_query("warmup")
+    except Exception as exc:
+        readiness.update(state="failed", error=str(exc))
+        print(f"[WARN] Index load failed: {exc}")
+        return
+    readiness.update(state="ready", seconds=round(time.perf_counter() - start, 2))
+    print(f"[INFO] Ready after {readiness['seconds']}s")
+    if DATA_WATCH_INTERVAL > 0:
+        buyer_indexer.watch(BUYERS_CSV, DATA_WATCH_INTERVAL)
+        grant_indexer.watch(GRANTS_CSV, DATA_WATCH_INTERVAL)
+
+
+def require_ready(endpoint):
+    """Fast 503 while warming instead of queueing requests behind the index build."""
+    if readiness["state"] != "ready":
+        REQUESTS_TOTAL.inc(endpoint, 503)
+        raise HTTPException(status_code=503, detail=f"Service is {readiness['state']}.",
+                            headers={"Retry-After": str(WARMING_RETRY_AFTER)})
+
+
 @app.on_event("startup")
 async def load_data():
-    buyer_indexer.load_buyers("/Users/sanyamjain/Desktop/waynova/data/buyer_profiles_real.csv")
-    grant_indexer.load_grants("/Users/sanyamjain/Desktop/waynova/data/Cal_Grants.csv")
+    if shard_router is not None:
+        readiness.update(state="ready", seconds=0.0)
+    elif LOAD_IN_BACKGROUND:
+        # keep a reference so the task isn't garbage collected mid-load
+        app.state.loader = asyncio.create_task(asyncio.to_thread(load_indexes))
+    else:
+        load_indexes()
+
+@app.on_event("shutdown")
+async def stop_workers():
+    match_pool.shutdown()
+    hash_pool.shutdown()
+    if shard_router is not None:
+        await shard_router.close()
+    await async_engine.dispose()
+
+# ----------------- Pagination -----------------
+def versions():
+    return [buyer_indexer.version, grant_indexer.version]
+
+
+def encode_cursor(offset, stamp) -> str:
+    """Opaque cursor for the page starting at ``offset`` of the results ``stamp`` versions."""
+    raw = json.dumps({"offset": offset, "versions": stamp}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """``(offset, versions stamp)`` of a cursor; 400 when malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        body = json.loads(raw)
+        offset = int(body["offset"])
+        stamp = body["versions"]
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+    if offset < 0:
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+    return offset, stamp
+
+
+def _timed_match(rep_input, **kwargs):
+    """Run one match in the worker thread and return it with its stage breakdown."""
+    start = time.perf_counter()
+    with collect_timings() as timings:
+        matches = get_ranked_matches_cosine(rep_input, **kwargs)
+    timings["total"] = time.perf_counter() - start
+    return matches, timings
+
 
 @app.post("/match", response_model=List[GrantMatch])
-def match_grants(rep_input: SalesRepDropdownInput):
+async def match_grants(rep_input: SalesRepDropdownInput,
+                       limit: Optional[int] = Query(None, ge=1, le=MATCH_MAX_LIMIT),
+                       cursor: Optional[str] = None,
+                       explain: bool = True,
+                       x_match_timing: Optional[str] = Header(None)):
+    """
+    Ranked grant matches for one rep selection. Send ``X-Match-Timing: 1``
+    to get the per-stage breakdown back in a ``Server-Timing`` header.
+
+    ``?limit=N`` returns one page; when more matches follow, the response
+    carries an ``X-Next-Cursor`` header to pass back as ``?cursor=``.
+    ``?explain=false`` drops the per-match explanation text.
+    """
     if not rep_input:
         raise HTTPException(status_code=400, detail="Request body is missing or invalid.")
-    return get_ranked_matches_cosine(rep_input)
+    require_ready("/match")
+    offset, stamp = decode_cursor(cursor) if cursor else (0, None)
+    # one extra row tells us whether there is a next page
+    fetch = limit + 1 if limit else None
+    start, status = time.perf_counter(), 200
+    try:
+        headers, timings = {}, None
+        if shard_router is not None:
+            with collect_timings() as timings:
+                matches, current = await shard_router.match(
+                    rep_input, offset + fetch if fetch else None, explain)
+            timings["total"] = time.perf_counter() - start
+            matches = matches[offset:]
+        else:
+            current = versions()
+            headers["X-Index-Versions"] = ",".join(map(str, current))
+            options = {"offset": offset, "limit": fetch, "explain": explain}
+            if x_match_timing:
+                matches, timings = await match_pool.run(_timed_match, rep_input, **options)
+            else:
+                matches = await match_pool.run(get_ranked_matches_cosine, rep_input, **options)
+        if stamp is not None and stamp != current:
+            raise HTTPException(status_code=409, detail="Matches changed since this cursor was "
+                                                        "issued; start again from the first page.")
+        if x_match_timing:
+            headers["Server-Timing"] = server_timing(timings)
+        if limit and len(matches) > limit:
+            matches = matches[:limit]
+            headers["X-Next-Cursor"] = encode_cursor(offset + limit, current)
+        return Response(dumps(matches), media_type="application/json", headers=headers)
+    except PoolSaturated as exc:
+        status = 429
+        raise HTTPException(status_code=429, detail="Matching is at capacity, please retry.",
+                            headers={"Retry-After": str(exc.retry_after)})
+    except ShardError as exc:
+        status = exc.status
+        raise HTTPException(status_code=exc.status, detail=exc.detail,
+                            headers={"Retry-After": exc.retry_after} if exc.retry_after else None)
+    except HTTPException as exc:
+        status = exc.status_code
+        raise
+    except Exception:
+        status = 500
+        raise
+    finally:
+        REQUESTS_TOTAL.inc("/match", status)
+        REQUEST_SECONDS.observe(time.perf_counter() - start, "/match")
+
+
+@app.post("/match/batch")
+async def match_grants_batch(rep_inputs: List[SalesRepDropdownInput],
+                             limit: Optional[int] = Query(None, ge=1, le=MATCH_MAX_LIMIT),
+                             explain: bool = True):
+    """
+    Match many rep inputs in one call. Streams NDJSON, one line per input in
+    request order: {"index": i, "matches": [...]}. ``limit`` and ``explain``
+    apply to every input as on /match.
+    """
+    require_ready("/match/batch")
+    if shard_router is None and match_pool.pending >= match_pool.capacity:
+        REQUESTS_TOTAL.inc("/match/batch", 429)
+        raise HTTPException(status_code=429, detail="Matching is at capacity, please retry.",
+                            headers={"Retry-After": str(match_pool.retry_after())})
+
+    async def rank(chunk):
+        if shard_router is not None:
+            return await shard_router.match_batch(chunk, limit, explain)
+        while True:
+            try:
+                return await match_pool.run(get_ranked_matches_batch, chunk,
+                                            limit=limit, explain=explain)
+            except PoolSaturated as exc:
+                await asyncio.sleep(exc.retry_after)
+
+    async def stream():
+        began = time.perf_counter()
+        for start in range(0, len(rep_inputs), BATCH_CHUNK_SIZE):
+            chunk = rep_inputs[start:start + BATCH_CHUNK_SIZE]
+            try:
+                ranked = await rank(chunk)
+            except ShardError as exc:
+                # the status line is already sent; report the failed inputs in-stream
+                for offset in range(len(chunk)):
+                    yield dumps({"index": start + offset, "error": exc.detail}) + b"\n"
+                continue
+            for offset, matches in enumerate(ranked):
+                line = {"index": start + offset, "matches": matches}
+                yield dumps(line) + b"\n"
+        REQUESTS_TOTAL.inc("/match/batch", 200)
+        REQUEST_SECONDS.observe(time.perf_counter() - began, "/match/batch")
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the process is up and serving, whether or not indexes are loaded."""
+    return {"status": "ok"}
+
+
+@app.get("/ready")
+async def ready():
+    """
+    Readiness: 200 once indexes and the model are loaded, 503 while warming or
+    failed. A router is ready when every shard node is.
+    """
+    if shard_router is not None:
+        shards = await shard_router.ready()
+        state = "ready" if all(s == "ready" for s in shards.values()) else "starting"
+        return JSONResponse({"state": state, "shards": shards},
+                            status_code=200 if state == "ready" else 503)
+    body = dict(readiness, shard=SHARD_NAME or None,
+                versions={"buyers": buyer_indexer.version, "grants": grant_indexer.version})
+    return JSONResponse(body, status_code=200 if readiness["state"] == "ready" else 503)
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus text-format metrics: stage/request latency histograms, caches, pool, indexes."""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
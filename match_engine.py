@@ -141,40 +141,125 @@
 #     return sorted(results, key=lambda x: x["confidence_score"], reverse=True)
 
 from data_loader import buyer_indexer, grant_indexer
+from precompute import buyer_grant_neighbors
+from scoring import score_candidates
+from caching import LRUCache
+from metadata import RowFilter
+from features import token_hashes
+from metrics import span, record, CANDIDATES_TOTAL, CANDIDATES_ELIMINATED
+from config import RESULT_CACHE_SIZE, RESULT_CACHE_TTL, MATCH_PREFILTER, DEBUG_LOG
 from models import SalesRepDropdownInput
+import heapq
 import math
+import time
+import numpy as np
 from datetime import datetime
 from rapidfuzz import fuzz
 
 
+# ---------------------------
+# Keyword boost constants
+# ---------------------------
+
+KW_TERM_WEIGHT = 0.25      # per matched term, times log1p(similarity)
+KW_DUAL_BONUS = 0.15       # keyword match and buyer context match together
+KW_CONTEXT_FLOOR = 0.1     # context match without a keyword match
+KW_PENALTY = -0.1          # neither
+KW_MAX = 0.6
+
+# Candidates scored per step of the cascade before the pruning bound is re-checked.
+CASCADE_BLOCK = 16
+# Absorbs float rounding so a bound is never below the exact score it bounds.
+BOUND_SLACK = 1e-9
+
+
 # ---------------------------
 # Utility functions
 # ---------------------------
 
-def lexical_overlap(a: str, b: str) -> float:
-    """Compute token overlap between buyer and grant text."""
-    a_tokens = set(a.lower().split())
-    b_tokens = set(b.lower().split())
-    if not a_tokens or not b_tokens:
+def build_rep_query(rep_input: SalesRepDropdownInput) -> str:
+    return f"{rep_input.agency_type} {rep_input.product_type} {rep_input.state}"
+
+
+def build_buyer_query(buyer, rep_input: SalesRepDropdownInput) -> str:
+    """Buyer's embedded text plus the rep's product and state, within the token budget."""
+    return buyer_indexer.text_builder.query(buyer, f"{rep_input.product_type} {rep_input.state}")
+
+
+def buyer_filter(rep_input: SalesRepDropdownInput, prefilter=True):
+    """Buyers in the rep's state (or national) with the rep's agency type."""
+    return RowFilter(state=rep_input.state, agency_type=rep_input.agency_type) if prefilter else None
+
+
+def grant_filter(rep_input: SalesRepDropdownInput, prefilter=True):
+    """Grants for the rep's state (or national) whose deadline hasn't passed."""
+    return RowFilter(state=rep_input.state, open_only=True) if prefilter else None
+
+
+def search_grouped(indexer, query_vecs, row_filters, top_k, state=None):
+    """Multi-query search with one FAISS call per distinct filter; hit lists in input order."""
+    groups = {}
+    for i, row_filter in enumerate(row_filters):
+        groups.setdefault(row_filter.key() if row_filter else None, []).append(i)
+    results = [None] * len(row_filters)
+    for rows in groups.values():
+        hits = indexer.search_by_vectors(query_vecs[rows], top_k, row_filters[rows[0]], state)
+        for i, row_hits in zip(rows, hits):
+            results[i] = row_hits
+    return results
+
+
+def overlap_bound(a_size, b_size) -> float:
+    """Upper bound on Jaccard token overlap from the two set sizes alone (no intersection needed)."""
+    if not a_size or not b_size:
         return 0.0
-    return len(a_tokens & b_tokens) / len(a_tokens | b_tokens)
+    return min(a_size, b_size) / max(a_size, b_size)
+
+
+def keyword_boost_bound(keyword_terms, context_match) -> float:
+    """Largest keyword boost any grant can earn for a buyer's terms (every term a perfect match)."""
+    best = len(keyword_terms) * KW_TERM_WEIGHT * math.log1p(1.0)
+    if context_match:
+        best += KW_DUAL_BONUS
+    return min(KW_MAX, max(best, KW_CONTEXT_FLOOR if context_match else KW_PENALTY)) + BOUND_SLACK
 
 
-def deadline_decay(deadline: str) -> float:
-    """Higher score when the deadline is closer (exponential decay)."""
-    try:
-        d = datetime.strptime(deadline.strip(), "%Y-%m-%d")
-        days_left = (d - datetime.now()).days
-        if days_left <= 0:
-            return 0.0
-        return math.exp(-days_left / 120)
-    except Exception:
-        return 0.5
+# ---------------------------
+# Result cache
+# ---------------------------
+
+# Ranked results per (dropdown selection, parameters, data version). The TTL
+# bounds how stale deadline decay can get; reloads change the version key.
+result_cache = LRUCache(RESULT_CACHE_SIZE, ttl=RESULT_CACHE_TTL)
+_cached_versions = None
 
 
-def keyword_similarity(term: str, text: str) -> float:
-    """Return fuzzy similarity (0–1) tolerant to plural/hyphen/spacing."""
-    return fuzz.partial_ratio(term.lower(), text.lower()) / 100.0
+def index_states():
+    """
+    The (buyer, grant) IndexStates one request works on.
+
+    Read once per request and passed to every search, feature and keyword
+    lookup, so a refresh swapping in new data mid-request is not seen.
+    """
+    return buyer_indexer._state, grant_indexer._state
+
+
+def _result_cache_key(rep_input: SalesRepDropdownInput, states, *params):
+    global _cached_versions
+    versions = tuple(state.version if state else 0 for state in states)
+    if versions != _cached_versions:
+        result_cache.clear()
+        _cached_versions = versions
+    # same normalization as the query-embedding cache, plus case ("Texas" == "texas")
+    return (*(" ".join(value.lower().split()) for value in
+              (rep_input.agency_type, rep_input.product_type, rep_input.state)),
+            *params, *versions)
+
+
+def cache_stats():
+    """Hit/miss counters for the query-embedding and ranked-result caches."""
+    return {"query_embeddings": buyer_indexer.embedder.query_cache.stats(),
+            "results": result_cache.stats()}
 
 
 # ---------------------------
@@ -182,23 +267,155 @@ def keyword_similarity(term: str, text: str) -> float:
 # ---------------------------
 
 def get_ranked_matches_cosine(rep_input: SalesRepDropdownInput,
-                              top_k_buyers=5, top_k_grants=5):
+                              top_k_buyers=5, top_k_grants=5, use_precomputed=True,
+                              prefilter=MATCH_PREFILTER, limit=None, offset=0, explain=True):
     """
     Hybrid semantic + metadata + lexical + geo + keyword scoring
     with contextual fallback, dual-match amplification, and
     alignment filtering between rep query and buyer product terms.
+
+    With ``use_precomputed`` the grants for each buyer come from the
+    precomputed buyer→grant neighbours (one encode per request); otherwise
+    every buyer query is encoded and searched against the grant index.
+
+    With ``prefilter`` both searches are restricted to eligible rows (state,
+    agency type, open deadline) inside FAISS instead of after retrieval. If
+    no buyer passes the filter, buyers are searched unfiltered.
+
+    Returns ranks ``offset .. offset + limit`` (all of them by default);
+    explanations are generated only for those rows and only with ``explain``.
+    With a ``limit`` only candidates that can still reach those ranks are
+    fully scored (see ``_rank_matches``).
     """
 
-    rep_query = f"{rep_input.agency_type} {rep_input.product_type} {rep_input.state}"
-    buyers = buyer_indexer.search(rep_query, top_k=top_k_buyers)
-    seen, results = set(), []
+    depth = None if limit is None else offset + limit
+    states = index_states()
+    cache_key = _result_cache_key(rep_input, states, top_k_buyers, top_k_grants,
+                                  use_precomputed, prefilter)
+    with span("result_cache"):
+        cached = result_cache.get(cache_key)
+    if cached is not None and cached.covers(depth):
+        return cached.page(offset, limit, explain)
+
+    with span("query_encode"):
+        rep_vec = buyer_indexer.embedder.encode_query(build_rep_query(rep_input))
+    with span("buyer_search"):
+        buyer_hits = buyer_indexer.search_by_vector(rep_vec, top_k_buyers,
+                                                    buyer_filter(rep_input, prefilter), states[0])
+        if not buyer_hits and prefilter:
+            buyer_hits = buyer_indexer.search_by_vector(rep_vec, top_k_buyers, state=states[0])
+    ranked = _rank_matches(rep_input, rep_vec, buyer_hits, top_k_grants, use_precomputed,
+                           prefilter, states, depth=depth)
+    result_cache.put(cache_key, ranked)
+    return ranked.page(offset, limit, explain)
+
+
+def get_ranked_matches_batch(rep_inputs, top_k_buyers=5, top_k_grants=5, use_precomputed=True,
+                             prefilter=MATCH_PREFILTER, limit=None, explain=True):
+    """
+    Rank many rep inputs at once; returns one ranked list per input, in order.
+
+    All uncached rep queries are encoded in one batch and searched against
+    the buyer index in one multi-query call. Without precomputed neighbours,
+    the distinct buyer queries of the whole batch are likewise encoded and
+    searched against the grant index together (one FAISS call per distinct
+    filter when ``prefilter`` is on). ``limit`` and ``explain`` apply to every
+    list as in ``get_ranked_matches_cosine``.
+    """
+    states = index_states()
+    keys = [_result_cache_key(r, states, top_k_buyers, top_k_grants, use_precomputed, prefilter)
+            for r in rep_inputs]
+    ranked = [result_cache.get(key) for key in keys]
+    ranked = [r if r is not None and r.covers(limit) else None for r in ranked]
+    todo = [i for i, r in enumerate(ranked) if r is None]
+    if not todo:
+        return [r.page(0, limit, explain) for r in ranked]
+
+    embedder = buyer_indexer.embedder
+    with span("query_encode"):
+        rep_vecs = embedder.encode_queries([build_rep_query(rep_inputs[i]) for i in todo])
+    with span("buyer_search"):
+        buyer_hits = search_grouped(buyer_indexer, rep_vecs,
+                                    [buyer_filter(rep_inputs[i], prefilter) for i in todo],
+                                    top_k_buyers, states[0])
+        for j, hits in enumerate(buyer_hits):
+            if not hits and prefilter:
+                buyer_hits[j] = buyer_indexer.search_by_vector(rep_vecs[j:j + 1], top_k_buyers,
+                                                               state=states[0])
+
+    grant_lists = [None] * len(todo)
+    if not use_precomputed:
+        pairs = [[(build_buyer_query(buyer, rep_inputs[i]), rep_inputs[i]) for _, buyer, _ in hits]
+                 for i, hits in zip(todo, buyer_hits)]
+        distinct = {}
+        for query, rep_input in (p for ps in pairs for p in ps):
+            row_filter = grant_filter(rep_input, prefilter)
+            distinct.setdefault((query, row_filter.key() if row_filter else None),
+                                (query, row_filter))
+        if distinct:
+            queries, filters = zip(*distinct.values())
+            with span("grant_encode"):
+                grant_vecs = embedder.encode_queries(list(queries))
+            with span("grant_search"):
+                grant_hits = dict(zip(distinct, search_grouped(
+                    grant_indexer, grant_vecs, list(filters), top_k_grants, states[1])))
+            grant_lists = [[grant_hits[(q, f.key() if f else None)]
+                            for q, f in ((q, grant_filter(r, prefilter)) for q, r in ps)]
+                           for ps in pairs]
+
+    for j, i in enumerate(todo):
+        ranked[i] = _rank_matches(rep_inputs[i], rep_vecs[j:j + 1], buyer_hits[j], top_k_grants,
+                                  use_precomputed, prefilter, states, grant_lists[j], depth=limit)
+        result_cache.put(keys[i], ranked[i])
+    return [r.page(0, limit, explain) for r in ranked]
+
+
+def _rank_matches(rep_input: SalesRepDropdownInput, rep_vec, buyer_hits, top_k_grants,
+                  use_precomputed, prefilter, states, grant_lists=None, depth=None):
+    """
+    Score the (buyer, grant) candidates for one rep input into a ``Ranking``.
 
-    # Tuned weights
-    W_BUYER, W_GRANT, W_LEX, W_DEADLINE, W_GEO = 0.20, 0.15, 0.25, 0.10, 0.15
+    Scoring is cascaded: semantic, geo and deadline terms come first, and with
+    a ``depth`` (the number of ranks the caller needs) each candidate gets an
+    upper bound on its confidence. Candidates then get lexical and keyword
+    scoring in bound order, and those whose bound falls below the running
+    ``depth``-th best confidence are dropped unscored. The top ``depth`` ranks
+    are the same as with every candidate scored.
 
-    for buyer, buyer_score in buyers:
-        buyer_query = " ".join(str(v) for v in buyer.values()) + f" {rep_input.product_type} {rep_input.state}"
-        grants = grant_indexer.search(buyer_query, top_k=top_k_grants)
+    ``states`` is the request's (buyer, grant) pair from ``index_states``.
+    """
+    seen, buyers, pairs = set(), [], []
+    retrieved = 0
+    grants_filter = grant_filter(rep_input, prefilter)
+
+    if grant_lists is None and use_precomputed:
+        with span("grant_retrieval"):
+            grant_lists = buyer_grant_neighbors.grants_for(
+                [buyer_id for buyer_id, _, _ in buyer_hits], rep_vec, top_k=top_k_grants,
+                row_filter=grants_filter, states=states)
+
+    product_type = rep_input.product_type.lower()
+    state = rep_input.state.lower()
+    grant_features = states[1].features
+    keyword_index = grant_features.keywords
+    now = datetime.now()
+    # stage totals for this request; the per-candidate work is too fine-grained for spans
+    feature_s = keyword_s = 0.0
+
+    # ---------------- Candidate Pairs ----------------
+    for n, (_, buyer, buyer_score) in enumerate(buyer_hits):
+        # lexical overlap still sees every buyer column, not just the embedded ones
+        buyer_context = " ".join(str(v).lower() for v in buyer.values())
+        buyer_tokens = token_hashes(f"{buyer_context} {product_type} {state}")
+        if grant_lists is not None:
+            grants = grant_lists[n]
+        else:
+            with span("grant_encode"):
+                grant_vec = grant_indexer.embedder.encode_query(build_buyer_query(buyer, rep_input))
+            with span("grant_search"):
+                grants = grant_indexer.search_by_vector(grant_vec, top_k_grants, grants_filter,
+                                                        states[1])
+        t0 = time.perf_counter()
 
         # Extract contextual keyword terms
         buyer_product_names = [p.strip().lower()
@@ -208,106 +425,221 @@ def get_ranked_matches_cosine(rep_input: SalesRepDropdownInput,
         keyword_terms = buyer_product_names + ([agency_type] if agency_type else [])
 
         # 🔹 Filter buyer terms so they align with the rep query
-        query_term = rep_input.product_type.lower()
+        query_term = product_type
         filtered_terms = []
         for term in keyword_terms:
             if fuzz.partial_ratio(term, query_term) / 100.0 >= 0.6 or query_term in term:
                 filtered_terms.append(term)
         keyword_terms = list(set(filtered_terms + [query_term]))
 
-        for grant, grant_score in grants:
+        # context-based fallback only depends on the buyer
+        context_match = product_type in buyer_context
+        buyers.append((buyer, buyer_score, buyer_tokens, keyword_terms, context_match))
+        t1 = time.perf_counter()
+        keyword_s += t1 - t0
+
+        for grant_id, grant, grant_score in grants:
+            retrieved += 1
             key = (grant.get("Grant Program Name", ""), grant.get("Administering Agency", ""))
             if key in seen:
                 continue
             seen.add(key)
-
-            gtext = " ".join(str(v) for v in grant.values())
-            lex = lexical_overlap(buyer_query, gtext)
-            ddl = deadline_decay(grant.get("Application Deadline", ""))
-            geo = 1.0 if rep_input.state.lower() in gtext.lower() else 0.7
+            pairs.append((n, grant_id, grant, grant_score))
+        feature_s += time.perf_counter() - t1
+
+    CANDIDATES_TOTAL.inc(amount=retrieved)
+    CANDIDATES_ELIMINATED.inc("duplicate", amount=retrieved - len(pairs))
+    if not pairs:
+        record("features", feature_s)
+        record("keyword_match", keyword_s)
+        return Ranking(rep_input, [], [], [], [])
+
+    # ---------------- Cheap Terms + Upper Bounds ----------------
+    t0 = time.perf_counter()
+    buyer_scores = [buyers[n][1] for n, _, _, _ in pairs]
+    grant_scores = [grant_score for _, _, _, grant_score in pairs]
+    grant_ids = [grant_id for _, grant_id, _, _ in pairs]
+    buyer_tokens = [tokens for _, _, tokens, _, _ in buyers]
+    ddls = grant_features.deadline_decay(grant_ids, now)
+    geos = np.where(grant_features.mentions(grant_ids, state), 1.0, 0.7).tolist()
+    feature_s += time.perf_counter() - t0
+
+    if depth is not None and depth < len(pairs):
+        with span("bound"):
+            token_counts = grant_features.token_counts[grant_ids].tolist()
+            lex_bounds = [overlap_bound(len(buyers[n][2]), count)
+                          for (n, _, _, _), count in zip(pairs, token_counts)]
+            keyword_bounds = [keyword_boost_bound(buyers[n][3], buyers[n][4])
+                              for n, _, _, _ in pairs]
+            _, bounds = score_candidates(buyer_scores, grant_scores, lex_bounds, ddls, geos,
+                                         keyword_bounds)
+            # stable: equal bounds keep candidate order
+            order = np.argsort(-bounds, kind="stable").tolist()
+        block = max(depth, CASCADE_BLOCK)
+    else:
+        bounds, order, block = None, list(range(len(pairs))), len(pairs)
+
+    # ---------------- Lexical + Keyword Boost (best bounds first) ----------------
+    candidates = [None] * len(pairs)
+    raws, confs = np.zeros(len(pairs)), np.zeros(len(pairs))
+    best = []  # min-heap of the ``depth`` best confidences so far
+    for start in range(0, len(order), block):
+        rows = order[start:start + block]
+        if bounds is not None and len(best) >= depth:
+            rows = [i for i in rows if bounds[i] >= best[0]]
+            if not rows:
+                break  # bounds only decrease from here on
+        t0 = time.perf_counter()
+        lexes = grant_features.token_overlap([pairs[i][1] for i in rows], buyer_tokens,
+                                             [pairs[i][0] for i in rows]).tolist()
+        feature_s += time.perf_counter() - t0
+        for i, lex in zip(rows, lexes):
+            n, grant_id, grant, grant_score = pairs[i]
+            buyer, buyer_score, _, keyword_terms, context_match = buyers[n]
+            t1 = time.perf_counter()
 
             # ---------------- Keyword Boost ----------------
-            keyword_fields = [
-                str(grant.get("Eligible Equipment/Expenses", "")),
-                str(grant.get("Purpose", "")),
-                str(grant.get("Focus Areas", "")),
-                str(grant.get("Eligible Applicants", "")),
-            ]
-            keyword_text = " ".join(keyword_fields)
             keyword_boost, matched_keywords = 0.0, []
-            grant_match, context_match = False, False
+            grant_match = False
 
             for term in keyword_terms:
-                sim = keyword_similarity(term, keyword_text)
-                # strict fuzzy + literal presence
-                if sim >= 0.85 and term.lower() in keyword_text.lower():
+                sim = keyword_index.lookup(term).get(grant_id)
+                # plural/hyphen/spacing tolerant phrase match from the inverted index
+                if sim is not None and sim >= 0.85:
                     grant_match = True
                     matched_keywords.append(f"{term} ({round(sim,2)})")
-                    keyword_boost += 0.25 * math.log1p(sim)
+                    keyword_boost += KW_TERM_WEIGHT * math.log1p(sim)
 
-            # context-based fallback
-            buyer_context = " ".join(str(v).lower() for v in buyer.values())
-            if rep_input.product_type.lower() in buyer_context:
-                context_match = True
+            if context_match:
                 if grant_match:
-                    keyword_boost += 0.15
-                elif not grant_match:
-                    keyword_boost = max(keyword_boost, 0.1)
+                    keyword_boost += KW_DUAL_BONUS
+                else:
+                    keyword_boost = max(keyword_boost, KW_CONTEXT_FLOOR)
 
             # sanity check: irrelevant keyword should not boost
-            if matched_keywords and rep_input.product_type.lower() not in " ".join(matched_keywords).lower():
+            if matched_keywords and product_type not in " ".join(matched_keywords).lower():
                 keyword_boost *= 0.2
 
             if not grant_match and not context_match:
-                keyword_boost = -0.1
-
-            keyword_boost = max(-0.1, min(0.6, keyword_boost))
-
-            # ---------------- Weighted Sum ----------------
-            raw = (W_BUYER * buyer_score +
-                   W_GRANT * grant_score +
-                   W_LEX * lex +
-                   W_DEADLINE * ddl +
-                   W_GEO * geo +
-                   keyword_boost)
-
-            raw = min(raw, 0.6)  # avoid runaway 100%
-
-            # ---------------- Confidence Score ----------------
-            conf = (1 / (1 + math.exp(-10 * (raw - 0.4)))) * 100
-            conf = round(min(100, conf * (1 + 0.4 * ddl)), 2)
-
-            # ---------------- Explanation ----------------
-            explanation = (
-                f"Matched on {rep_input.product_type} for {rep_input.agency_type} in {rep_input.state}. "
-                f"Buyer={buyer_score:.2f}, Grant={grant_score:.2f}, Lex={lex:.2f}, "
-                f"Deadline={ddl:.2f}, Geo={geo}, KWBoost={keyword_boost:.2f}, Raw={raw:.3f}. "
-            )
-            if matched_keywords:
-                explanation += f"Keywords matched: {matched_keywords}. "
-            elif context_match:
-                explanation += "No direct keyword match, but contextual boost applied. "
-            else:
-                explanation += "No keyword match detected (penalty applied). "
-
-            explanation += "Grant fields checked: Eligible Equipment/Expenses, Purpose, Focus Areas, Eligible Applicants."
-
-            results.append({
-                "grant_title": grant.get("Grant Program Name", "Unknown Program"),
-                "description": grant.get("Purpose", "No Description"),
-                "agency": grant.get("Administering Agency", "Unknown Agency"),
-                "amount": grant.get("Award Amount Range", ""),
-                "deadline": grant.get("Application Deadline", ""),
-                "buyer_agency": buyer.get("Agency Name", "Unknown Agency"),
-                "buyer_score": round(buyer_score * 100, 2),
-                "grant_score": round(grant_score * 100, 2),
-                "confidence_score": conf,
-                "explanation": explanation
-            })
-
+                keyword_boost = KW_PENALTY
+
+            keyword_boost = max(KW_PENALTY, min(KW_MAX, keyword_boost))
+            keyword_s += time.perf_counter() - t1
+
+            candidates[i] = (buyer, grant, grant_id, buyer_score, grant_score, lex, geos[i],
+                             keyword_boost, matched_keywords, context_match, grant_match)
+
+        # ---------------- Weighted Sum + Confidence Score ----------------
+        with span("scoring"):
+            block_raws, block_confs = score_candidates(
+                [buyer_scores[i] for i in rows], [grant_scores[i] for i in rows],
+                [candidates[i][5] for i in rows], ddls[rows], [geos[i] for i in rows],
+                [candidates[i][7] for i in rows])
+            raws[rows], confs[rows] = block_raws, block_confs
+        if bounds is not None:
+            for conf in block_confs:
+                if len(best) < depth:
+                    heapq.heappush(best, conf)
+                elif conf > best[0]:
+                    heapq.heapreplace(best, conf)
+
+    record("features", feature_s)
+    record("keyword_match", keyword_s)
+    kept = [i for i in range(len(pairs)) if candidates[i] is not None]
+    CANDIDATES_ELIMINATED.inc("upper_bound", amount=len(pairs) - len(kept))
+    candidates = [candidates[i] for i in kept]
+    ddls, raws, confs = ddls[kept], raws[kept], confs[kept]
+
+    if DEBUG_LOG:
+        for (_, _, _, _, _, lex, geo, keyword_boost, matched_keywords, context_match,
+             grant_match), raw, conf in zip(candidates, raws, confs):
             print(f"[DEBUG] Raw={raw:.3f}, KWBoost={keyword_boost:.2f}, "
                   f"Lex={lex:.2f}, Geo={geo}, Conf={conf:.2f}, "
                   f"Context={context_match}, GrantMatch={grant_match}, "
                   f"Keywords={matched_keywords}")
+    return Ranking(rep_input, candidates, ddls, raws, confs, depth)
+
+
+# ---------------------------
+# Ranked candidates
+# ---------------------------
+
+class Ranking:
+    """
+    Scored candidates for one rep input; result dicts are only built for the
+    rows a caller actually returns.
+
+    ``page`` picks the top ``offset + limit`` scores with a heap instead of
+    sorting every candidate, and writes explanations only when asked. Ties
+    keep candidate order, exactly like the full stable sort.
+
+    A ranking built with a ``depth`` holds only the candidates that could
+    reach the top ``depth`` ranks, so it can serve pages down to that rank.
+    """
 
-    return sorted(results, key=lambda x: x["confidence_score"], reverse=True)
+    def __init__(self, rep_input, candidates, ddls, raws, confs, depth=None):
+        self.rep_input = rep_input
+        self.candidates = candidates
+        self.ddls = ddls
+        self.raws = raws
+        self.confs = [float(c) for c in confs]
+        self.depth = depth
+
+    def __len__(self):
+        return len(self.candidates)
+
+    def covers(self, depth):
+        """Whether the top ``depth`` ranks (all of them when None) are exact."""
+        return self.depth is None or (depth is not None and depth <= self.depth)
+
+    def top(self, n=None):
+        """Candidate positions of the ``n`` best scores (all of them when ``n`` is None)."""
+        order = range(len(self.confs))
+        if n is None or n >= len(self.confs):
+            return sorted(order, key=self.confs.__getitem__, reverse=True)
+        return heapq.nlargest(n, order, key=self.confs.__getitem__)
+
+    def page(self, offset=0, limit=None, explain=True):
+        """Result dicts for ranks ``offset .. offset + limit``."""
+        with span("sort"):
+            picked = self.top(None if limit is None else offset + limit)[offset:]
+        explain_start = time.perf_counter()
+        results = [self._result(i, explain) for i in picked]
+        record("explain", time.perf_counter() - explain_start)
+        return results
+
+    def _result(self, i, explain):
+        (buyer, grant, _, buyer_score, grant_score, _, _, _, _, _, _) = self.candidates[i]
+        result = {
+            "grant_title": grant.get("Grant Program Name", "Unknown Program"),
+            "description": grant.get("Purpose", "No Description"),
+            "agency": grant.get("Administering Agency", "Unknown Agency"),
+            "amount": grant.get("Award Amount Range", ""),
+            "deadline": grant.get("Application Deadline", ""),
+            "buyer_agency": buyer.get("Agency Name", "Unknown Agency"),
+            "buyer_score": round(buyer_score * 100, 2),
+            "grant_score": round(grant_score * 100, 2),
+            "confidence_score": self.confs[i],
+        }
+        if explain:
+            result["explanation"] = self.explanation(i)
+        return result
+
+    def explanation(self, i):
+        rep_input = self.rep_input
+        (_, _, _, buyer_score, grant_score, lex, geo, keyword_boost, matched_keywords,
+         context_match, _) = self.candidates[i]
+        explanation = (
+            f"Matched on {rep_input.product_type} for {rep_input.agency_type} in {rep_input.state}. "
+            f"Buyer={buyer_score:.2f}, Grant={grant_score:.2f}, Lex={lex:.2f}, "
+            f"Deadline={self.ddls[i]:.2f}, Geo={geo}, KWBoost={keyword_boost:.2f}, Raw={self.raws[i]:.3f}. "
+        )
+        if matched_keywords:
+            explanation += f"Keywords matched: {matched_keywords}. "
+        elif context_match:
+            explanation += "No direct keyword match, but contextual boost applied. "
+        else:
+            explanation += "No keyword match detected (penalty applied). "
+
+        explanation += "Grant fields checked: Eligible Equipment/Expenses, Purpose, Focus Areas, Eligible Applicants."
+        return explanation
@@ -0,0 +1,115 @@
+import faiss
+import numpy as np
+import pyarrow as pa
+
+from features import normalize_state, days_left
+
+
+class RowFilter:
+    """
+    Structured constraints applied inside the vector search.
+
+    ``state``: rows tied to that state plus rows with no state (national).
+    ``agency_type``: rows of that agency type (ignored if no row has it).
+    ``open_only``: drop rows whose deadline has passed (unknown deadlines stay).
+    """
+
+    __slots__ = ("state", "agency_type", "open_only")
+
+    def __init__(self, state=None, agency_type=None, open_only=False):
+        self.state = state
+        self.agency_type = agency_type
+        self.open_only = open_only
+
+    def key(self):
+        return (self.state, self.agency_type, self.open_only)
+
+
+# ----------------- Metadata Index -----------------
+class MetadataIndex:
+    """
+    Boolean row masks per state / agency type plus parsed deadlines, indexed by row id.
+
+    ``arrays()`` / ``from_arrays`` round-trip it through the index cache entry,
+    so warm starts map the masks instead of re-reading every row.
+    """
+
+    def __init__(self, states, agency_types=None, deadlines=None):
+        n = len(states)
+        live = np.array([s is not None for s in states], dtype=bool)
+        state_names = sorted({state for row_states in states for state in row_states or ()})
+        state_rows = np.zeros((len(state_names), n), dtype=bool)
+        column = {state: i for i, state in enumerate(state_names)}
+        for row_id, row_states in enumerate(states):
+            for state in row_states or ():
+                state_rows[column[state], row_id] = True
+        agency_names = sorted({agency for agency in agency_types or () if agency})
+        agency_rows = np.zeros((len(agency_names), n), dtype=bool)
+        column = {agency: i for i, agency in enumerate(agency_names)}
+        for row_id, agency in enumerate(agency_types or ()):
+            if agency:
+                agency_rows[column[agency], row_id] = True
+        self._set(live, state_names, state_rows, agency_names, agency_rows, deadlines)
+
+    def _set(self, live, state_names, state_rows, agency_names, agency_rows, deadlines):
+        self.size = len(live)
+        self.live = live
+        self.national = live & ~state_rows.any(axis=0)
+        self.by_state = dict(zip(state_names, state_rows))
+        self.by_agency = dict(zip(agency_names, agency_rows))
+        self.deadlines = deadlines
+        self._arrays = {"live": live, "state_names": pa.array(state_names, pa.string()),
+                        "state_rows": state_rows, "agency_names": pa.array(agency_names, pa.string()),
+                        "agency_rows": agency_rows}
+        if deadlines is not None:
+            self._arrays["deadlines"] = deadlines
+
+    def arrays(self) -> dict:
+        return dict(self._arrays)
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        index = cls.__new__(cls)
+        index._set(arrays["live"], arrays["state_names"].to_pylist(), arrays["state_rows"],
+                   arrays["agency_names"].to_pylist(), arrays["agency_rows"],
+                   arrays.get("deadlines"))
+        return index
+
+    def mask(self, row_filter: RowFilter, now=None):
+        """Eligible-row mask for ``row_filter``, or None when nothing is restricted."""
+        mask = None
+        if row_filter.state:
+            state_rows = self.by_state.get(normalize_state(row_filter.state))
+            if state_rows is not None:
+                mask = state_rows | self.national
+        if row_filter.agency_type:
+            agency_rows = self.by_agency.get(" ".join(row_filter.agency_type.lower().split()))
+            if agency_rows is not None:
+                mask = agency_rows if mask is None else mask & agency_rows
+        if row_filter.open_only and self.deadlines is not None:
+            days = days_left(self.deadlines, now)
+            with np.errstate(invalid="ignore"):
+                open_rows = np.isnan(days) | (days > 0)
+            mask = open_rows if mask is None else mask & open_rows
+        if mask is None:
+            return None
+        return mask & self.live
+
+
+def search_params(index, mask):
+    """
+    FAISS SearchParameters restricting ``index`` to the row ids set in ``mask``.
+
+    Returns ``(params, bitmap)``; the caller must keep ``bitmap`` alive for
+    as long as ``params`` is in use.
+    """
+    bitmap = np.packbits(mask, bitorder="little")
+    selector = faiss.IDSelectorBitmap(len(mask), faiss.swig_ptr(bitmap))
+    base = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else index
+    if isinstance(base, faiss.IndexIVF):
+        params = faiss.SearchParametersIVF(sel=selector, nprobe=base.nprobe)
+    elif isinstance(base, faiss.IndexHNSW):
+        params = faiss.SearchParametersHNSW(sel=selector, efSearch=base.hnsw.efSearch)
+    else:
+        params = faiss.SearchParameters(sel=selector)
+    return params, (bitmap, selector)
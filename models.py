@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 
 # Input from Sales Rep dropdowns
 class SalesRepDropdownInput(BaseModel):
@@ -18,4 +18,4 @@ class GrantMatch(BaseModel):
     buyer_agency: str
     buyer_score: float
     grant_score: float
-    explanation: str
\ No newline at end of file
+    explanation: Optional[str] = None  # only with ?explain=true (the default)
\ No newline at end of file
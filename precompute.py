@@ -0,0 +1,115 @@
+import threading
+import numpy as np
+from data_loader import buyer_indexer, grant_indexer
+from config import PRECOMPUTE_TOP_N, QUERY_ADJUST_WEIGHT
+
+
+# ----------------- Buyer → Grant Neighbours -----------------
+class BuyerGrantNeighbors:
+    """
+    Offline top-N grant neighbours (ids + cosine scores) for every buyer row.
+
+    /match used to re-encode ``buyer text + product_type + state`` for each
+    retrieved buyer. Here the rep-dependent suffix is folded in as a vector
+    shift instead: the buyer vector b is moved towards the rep query vector q,
+
+        score(g) = (b·g + w * q·g) / ||b + w * q||
+
+    and only the precomputed neighbours are re-ranked, so a request needs no
+    encode beyond the rep query itself.
+
+    The neighbours are published as one ``(ids, scores, versions)`` tuple and
+    rebuilt by whichever thread swaps in new buyer or grant data, never by a
+    request.
+    """
+
+    def __init__(self, buyers, grants, top_n=PRECOMPUTE_TOP_N, query_weight=QUERY_ADJUST_WEIGHT):
+        self.buyers = buyers
+        self.grants = grants
+        self.top_n = top_n
+        self.query_weight = query_weight
+        self.snapshot = None
+        self._lock = threading.Lock()
+        buyers.on_swap(self._rebuild)
+        grants.on_swap(self._rebuild)
+
+    def build(self):
+        """Search every buyer embedding against the grant index in one batch."""
+        with self._lock:
+            buyer_state, grant_state = self.buyers._state, self.grants._state
+            if buyer_state is None or grant_state is None:
+                return
+            versions = (buyer_state.version, grant_state.version)
+            if self.snapshot is not None and self.snapshot[2] == versions:
+                return
+            buyer_vecs = np.ascontiguousarray(buyer_state.embeddings, dtype="float32")
+            top_n = min(self.top_n, grant_state.index.ntotal)
+            scores, ids = grant_state.index.search(buyer_vecs, top_n)
+            self.snapshot = (ids, scores, versions)
+
+    def _rebuild(self):
+        # after a refresh; the first build is left to the loader (see main.load_indexes)
+        if self.snapshot is not None:
+            self.build()
+
+    def grants_for(self, buyer_ids, query_vec, top_k=5, row_filter=None, states=None):
+        """
+        Re-rank each buyer's precomputed neighbours against the rep query.
+
+        ``row_filter`` (a metadata.RowFilter) restricts the grants. Buyers
+        the snapshot doesn't cover (added, or data swapped in since the last
+        build), or with fewer than ``top_k`` neighbours passing the filter,
+        are searched directly with their shifted vector and the filter instead.
+        ``states`` is the request's (buyer, grant) IndexState pair (default:
+        the current ones). Returns one list of (grant_id, grant, score) per
+        buyer id, best first.
+        """
+        ids, scores, versions = self.snapshot or (None, None, None)
+        buyer_state, grant_state = states or (self.buyers._state, self.grants._state)
+        buyer_ids = np.asarray(buyer_ids, dtype=np.int64)
+        w, q = self.query_weight, query_vec[0]
+        buyer_vecs = np.asarray(buyer_state.embeddings)[buyer_ids]
+        norms = np.sqrt(np.maximum(1.0 + w * w + 2.0 * w * (buyer_vecs @ q), 1e-12))
+
+        results = [None] * len(buyer_ids)
+        if versions == (buyer_state.version, grant_state.version):
+            rows = np.flatnonzero(buyer_ids < len(ids))
+            for row, hits in zip(rows, self._rerank(ids[buyer_ids[rows]], scores[buyer_ids[rows]],
+                                                    q, norms[rows], top_k, grant_state,
+                                                    row_filter)):
+                results[row] = hits
+
+        missing = [row for row, hits in enumerate(results) if hits is None]
+        if missing:
+            shifted = (buyer_vecs[missing] + w * q) / norms[missing, None]
+            hits = self.grants.search_by_vectors(np.ascontiguousarray(shifted, dtype="float32"),
+                                                 top_k, row_filter, grant_state)
+            for row, row_hits in zip(missing, hits):
+                results[row] = row_hits
+        return results
+
+    def _rerank(self, ids, scores, q, norms, top_k, grant_state, row_filter):
+        allowed = grant_state.metadata.mask(row_filter) if row_filter is not None else None
+        valid = ids >= 0
+        needed = min(top_k, grant_state.index.ntotal)
+        if allowed is not None:
+            valid &= allowed[np.where(valid, ids, 0)]
+            needed = min(needed, int(allowed.sum()))
+        grant_vecs = grant_state.embeddings[np.where(valid, ids, 0)]
+        adjusted = scores + self.query_weight * (grant_vecs @ q)
+        adjusted = np.where(valid, adjusted / norms[:, None], -np.inf)
+
+        k = min(top_k, adjusted.shape[1])
+        top = np.argsort(-adjusted, axis=1, kind="stable")[:, :k]
+        results = []
+        for row, cols in enumerate(top):
+            grants = [(int(ids[row, c]), grant_state.records[ids[row, c]],
+                       round(float(adjusted[row, c]), 3))
+                      for c in cols if valid[row, c]]
+            grants = [hit for hit in grants if hit[1] is not None]
+            # None: too few neighbours survive the filter, search this buyer instead
+            results.append(grants if len(grants) >= needed else None)
+        return results
+
+
+buyer_grant_neighbors = BuyerGrantNeighbors(buyer_indexer, grant_indexer)
@@ -0,0 +1,66 @@
+import numpy as np
+import pyarrow as pa
+
+ITER_BATCH_ROWS = 4096
+
+
+# ----------------- Record Store -----------------
+class RecordStore:
+    """
+    CSV rows kept column-wise in an Arrow table instead of one dict per row.
+
+    ``store[row_id]`` materializes a plain dict for that row (or None once the
+    row is deleted), so callers keep using ``.get`` / ``.values()``. ``rows``
+    maps row ids to physical table rows: updates append a new physical row
+    and deletes set -1, so the table is append-only and row ids stay stable.
+    """
+
+    def __init__(self, table: pa.Table, rows=None):
+        self.table = table
+        self.columns = table.column_names
+        self.rows = np.arange(table.num_rows, dtype=np.int64) if rows is None else rows
+
+    @classmethod
+    def from_batches(cls, batches, columns=()):
+        if not batches:
+            return cls(pa.table({c: pa.array([], pa.string()) for c in columns}))
+        return cls(pa.Table.from_batches(batches).combine_chunks())
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, row_id):
+        physical = self.rows[row_id]
+        if physical < 0:
+            return None
+        return self.table.slice(int(physical), 1).to_pylist()[0]
+
+    def __iter__(self):
+        """Rows in id order (None for deleted ones), materialized a batch at a time."""
+        for start in range(0, len(self.rows), ITER_BATCH_ROWS):
+            physical = self.rows[start:start + ITER_BATCH_ROWS]
+            live = physical >= 0
+            batch = iter(self.table.take(pa.array(physical[live])).to_pylist())
+            for is_live in live:
+                yield next(batch) if is_live else None
+
+    def live_ids(self) -> np.ndarray:
+        return np.flatnonzero(self.rows >= 0)
+
+    def with_changes(self, deleted=(), updated=None, appended=()):
+        """
+        New store with rows deleted, replaced ({row_id: record}) or appended.
+
+        Appended rows get ids ``len(self) ...`` in order. The current store is
+        left untouched, so readers holding it are unaffected.
+        """
+        updated = updated or {}
+        extra = list(updated.values()) + list(appended)
+        rows = np.concatenate([self.rows, np.full(len(appended), -1, dtype=np.int64)])
+        rows[list(deleted)] = -1
+        table = self.table
+        if extra:
+            new_ids = list(updated) + list(range(len(self.rows), len(self.rows) + len(appended)))
+            rows[new_ids] = np.arange(table.num_rows, table.num_rows + len(extra))
+            table = pa.concat_tables([table, pa.Table.from_pylist(extra, schema=table.schema)])
+        return RecordStore(table, rows)
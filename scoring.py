@@ -0,0 +1,47 @@
+import numpy as np
+
+
+# ---------------------------
+# Scoring constants
+# ---------------------------
+
+# Tuned weights
+W_BUYER, W_GRANT, W_LEX, W_DEADLINE, W_GEO = 0.20, 0.15, 0.25, 0.10, 0.15
+
+RAW_CAP = 0.6             # avoid runaway 100%
+SIGMOID_SLOPE = 10.0
+SIGMOID_CENTER = 0.4
+DEADLINE_MULTIPLIER = 0.4
+
+
+# ---------------------------
+# Vectorized kernel
+# ---------------------------
+
+def score_candidates(buyer_scores, grant_scores, lex, ddl, geo, keyword_boost):
+    """
+    Score every (buyer, grant) candidate in one pass.
+
+    All inputs are equal-length 1-D arrays (one entry per candidate pair).
+    Returns ``(raw, confidence)`` where ``raw`` is the clamped weighted sum and
+    ``confidence`` the 0–100 sigmoid score with the deadline multiplier,
+    rounded to 2 decimals.
+    """
+    buyer_scores = np.asarray(buyer_scores, dtype=np.float64)
+    grant_scores = np.asarray(grant_scores, dtype=np.float64)
+    lex = np.asarray(lex, dtype=np.float64)
+    ddl = np.asarray(ddl, dtype=np.float64)
+    geo = np.asarray(geo, dtype=np.float64)
+    keyword_boost = np.asarray(keyword_boost, dtype=np.float64)
+
+    raw = (W_BUYER * buyer_scores +
+           W_GRANT * grant_scores +
+           W_LEX * lex +
+           W_DEADLINE * ddl +
+           W_GEO * geo +
+           keyword_boost)
+    raw = np.minimum(raw, RAW_CAP)
+
+    conf = (1 / (1 + np.exp(-SIGMOID_SLOPE * (raw - SIGMOID_CENTER)))) * 100
+    conf = np.round(np.minimum(100, conf * (1 + DEADLINE_MULTIPLIER * ddl)), 2)
+    return raw, conf
@@ -0,0 +1,17 @@
+import json
+
+try:
+    import orjson
+except ImportError:  # optional: falls back to the stdlib encoder
+    orjson = None
+
+
+def dumps(value) -> bytes:
+    """Compact JSON bytes; result dicts hold only str/float so no model validation is needed."""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def loads(data):
+    return orjson.loads(data) if orjson is not None else json.loads(data)
@@ -0,0 +1,253 @@
+"""
+State sharding: which shard holds which rows, and the router that fans
+/match out to shard nodes.
+
+Run a local cluster (one process per shard plus the router) with:
+
+    SHARD_MAP="west=california,nevada;south=texas,florida" python sharding.py --port 8000
+"""
+import argparse
+import asyncio
+import heapq
+import os
+import subprocess
+import sys
+
+from features import US_STATES, normalize_state
+from metrics import span
+from serialization import dumps, loads
+from config import (SHARD_MAP, SHARD_NAME, SHARD_NODES, SHARD_TIMEOUT, MATCH_PREFILTER,
+                    MATCH_MAX_LIMIT)
+
+# Shard holding the states SHARD_MAP doesn't list.
+NATIONAL = "national"
+
+
+# ----------------- Shard Map -----------------
+class ShardMap:
+    """
+    State → shard assignment shared by shard nodes and the router.
+
+    Rows tied to states belong to those states' shards (several, for
+    multi-state rows); national rows (no state) belong to every shard.
+    """
+
+    def __init__(self, spec=""):
+        self.states = {}
+        for part in filter(None, (p.strip() for p in spec.split(";"))):
+            name, _, states = part.partition("=")
+            name = name.strip()
+            if not name or name == NATIONAL or name in self.states:
+                raise ValueError(f"SHARD_MAP: bad or repeated shard name {name!r}")
+            self.states[name] = frozenset(normalize_state(s) for s in states.split(",") if s.strip())
+        self._owner = {}
+        for name, states in self.states.items():
+            for state in states:
+                if state not in US_STATES:
+                    raise ValueError(f"SHARD_MAP: unknown state {state!r} in shard {name!r}")
+                if state in self._owner:
+                    raise ValueError(f"SHARD_MAP: {state!r} is in both {self._owner[state]!r} "
+                                     f"and {name!r}")
+                self._owner[state] = name
+        self.names = list(self.states) + [NATIONAL]
+
+    def shard_for(self, state) -> str:
+        return self._owner.get(normalize_state(state), NATIONAL)
+
+    def shards_for(self, row_states) -> set:
+        """Shards a row with ``row_states`` belongs to (all of them for national rows)."""
+        if not row_states:
+            return set(self.names)
+        return {self.shard_for(state) for state in row_states}
+
+    def key(self, name) -> str:
+        """Cache-key part for shard ``name``: its own rows depend on the whole map."""
+        layout = ";".join(f"{n}={','.join(sorted(s))}" for n, s in sorted(self.states.items()))
+        return f"{name}|{layout}"
+
+
+shard_map = ShardMap(SHARD_MAP)
+if SHARD_NAME and SHARD_NAME not in shard_map.names:
+    raise ValueError(f"SHARD_NAME {SHARD_NAME!r} is not one of {shard_map.names}")
+
+
+def merge_matches(lists, limit=None):
+    """
+    Merge per-shard match lists (each sorted by confidence) into one, best
+    first; a grant returned by several shards is kept once.
+    """
+    if len(lists) == 1:
+        return lists[0][:limit]
+    merged, seen = [], set()
+    for match in heapq.merge(*lists, key=lambda m: -m["confidence_score"]):
+        key = (match["grant_title"], match["agency"])
+        if key in seen:
+            continue
+        seen.add(key)
+        merged.append(match)
+        if limit is not None and len(merged) == limit:
+            break
+    return merged
+
+
+# ----------------- Shard Router -----------------
+class ShardError(Exception):
+    """A shard node failed or refused a request; ``status`` is what the router answers."""
+
+    def __init__(self, status, detail, retry_after=None):
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class ShardRouter:
+    """
+    Sends each /match to the shard nodes that hold the rep's state and merges
+    their top matches by confidence.
+
+    With the prefilter on, a rep's state lives on exactly one shard. Without
+    it every shard is queried in parallel.
+    """
+
+    def __init__(self, nodes, shard_map=shard_map, prefilter=MATCH_PREFILTER,
+                 timeout=SHARD_TIMEOUT):
+        missing = set(shard_map.names) - set(nodes)
+        if missing:
+            raise ValueError(f"SHARD_NODES has no node for shard(s) {sorted(missing)}")
+        self.nodes = {name: url.rstrip("/") for name, url in nodes.items()}
+        self.shard_map = shard_map
+        self.prefilter = prefilter
+        self.timeout = timeout
+        self._client = None
+
+    @classmethod
+    def from_config(cls, spec=SHARD_NODES):
+        """Router for ``SHARD_NODES``, or None when this process isn't a router."""
+        nodes = dict(part.strip().split("=", 1) for part in spec.split(",") if part.strip())
+        return cls(nodes) if nodes else None
+
+    def route(self, rep_input):
+        """Shards a rep input has to be sent to."""
+        if self.prefilter:
+            return [self.shard_map.shard_for(rep_input.state)]
+        return self.shard_map.names
+
+    @property
+    def client(self):
+        if self._client is None:
+            import httpx
+            self._client = httpx.AsyncClient(timeout=self.timeout)
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _request(self, shard, method, path, body=None, params=None):
+        import httpx
+        try:
+            response = await self.client.request(
+                method, self.nodes[shard] + path, params=params,
+                content=dumps(body) if body is not None else None,
+                headers={"Content-Type": "application/json"})
+        except httpx.HTTPError as exc:
+            raise ShardError(502, f"Shard {shard!r} is unreachable: {exc!r}")
+        if response.status_code != 200 and path != "/ready":
+            # the shard's own back-pressure is passed on; anything else is a bad gateway
+            status = response.status_code if response.status_code in (429, 503) else 502
+            raise ShardError(status, f"Shard {shard!r} answered {response.status_code}.",
+                             response.headers.get("Retry-After"))
+        return response
+
+    def _params(self, limit, explain):
+        params = {"explain": "true" if explain else "false"}
+        if limit is not None and limit <= MATCH_MAX_LIMIT:
+            params["limit"] = limit
+        return params
+
+    async def match(self, rep_input, limit=None, explain=True):
+        """
+        Top ``limit`` matches (all when None) across the rep's shards, plus
+        the shards' index versions for cursor stamps.
+        """
+        shards = self.route(rep_input)
+        with span("shard_fanout"):
+            responses = await asyncio.gather(*(
+                self._request(shard, "POST", "/match", dict(rep_input), self._params(limit, explain))
+                for shard in shards))
+        with span("shard_merge"):
+            matches = merge_matches([loads(r.content) for r in responses], limit)
+        stamp = [[shard, r.headers.get("X-Index-Versions")] for shard, r in zip(shards, responses)]
+        return matches, stamp
+
+    async def match_batch(self, rep_inputs, limit=None, explain=True):
+        """One merged match list per rep input, with one /match/batch call per shard."""
+        routed = {}
+        for i, rep_input in enumerate(rep_inputs):
+            for shard in self.route(rep_input):
+                routed.setdefault(shard, []).append(i)
+        with span("shard_fanout"):
+            responses = await asyncio.gather(*(
+                self._request(shard, "POST", "/match/batch", [dict(rep_inputs[i]) for i in rows],
+                              self._params(limit, explain))
+                for shard, rows in routed.items()))
+        per_input = [[] for _ in rep_inputs]
+        for rows, response in zip(routed.values(), responses):
+            for line in response.content.splitlines():
+                item = loads(line)
+                per_input[rows[item["index"]]].append(item["matches"])
+        with span("shard_merge"):
+            return [merge_matches(lists, limit) for lists in per_input]
+
+    async def ready(self):
+        """Readiness state reported by every shard node ("unreachable" when it didn't answer)."""
+        async def probe(shard):
+            try:
+                return loads((await self._request(shard, "GET", "/ready")).content)["state"]
+            except (ShardError, ValueError, KeyError):
+                return "unreachable"
+
+        states = await asyncio.gather(*(probe(shard) for shard in self.shard_map.names))
+        return dict(zip(self.shard_map.names, states))
+
+
+# ----------------- Local Cluster -----------------
+def run_local(port, host="127.0.0.1"):
+    """
+    One uvicorn process per shard on ``port + 1 ...`` plus the router on
+    ``port``, all on this machine; stops them all on Ctrl-C.
+    """
+    nodes = {name: f"http://{host}:{port + 1 + i}" for i, name in enumerate(shard_map.names)}
+    env = dict(os.environ, SHARD_NAME="", SHARD_NODES="")
+    procs = []
+    try:
+        for name, url in nodes.items():
+            shard_env = dict(env, SHARD_NAME=name)
+            procs.append(subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "main:app", "--host", host,
+                 "--port", url.rsplit(":", 1)[1]], env=shard_env))
+            states = (", ".join(sorted(shard_map.states[name])) if name != NATIONAL
+                      else "every other state")
+            print(f"[INFO] shard {name!r} ({states}) on {url}")
+        router_env = dict(env, SHARD_NODES=",".join(f"{n}={u}" for n, u in nodes.items()))
+        procs.append(subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--host", host, "--port", str(port)],
+            env=router_env))
+        print(f"[INFO] router on http://{host}:{port}")
+        for proc in procs:
+            proc.wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for proc in procs:
+            proc.terminate()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run every shard of SHARD_MAP plus a router locally.")
+    parser.add_argument("--port", type=int, default=8000, help="router port; shards use the next ones")
+    parser.add_argument("--host", default="127.0.0.1")
+    args = parser.parse_args()
+    run_local(args.port, args.host)
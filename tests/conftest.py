@@ -0,0 +1,18 @@
+import os
+import sys
+
+import pytest
+
+# Tests run offline against synthetic CSVs; indexers that need a cache get a temporary one.
+os.environ["INDEX_CACHE_DIR"] = ""
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(autouse=True, scope="session")
+def stub_model():
+    """Swap the shared SentenceTransformer for the benchmarks' hashing encoder."""
+    from embedding import embedding_service
+    from benchmarks.stub_model import HashingEncoder
+    embedding_service.model = HashingEncoder(64)
+    embedding_service.model_name = "stub-hashing-64"
+    return embedding_service
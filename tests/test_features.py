@@ -0,0 +1,41 @@
+import numpy as np
+
+from benchmarks.synthetic import generate_grants
+from features import GrantFeatureStore, token_hashes
+
+
+def test_token_overlap_and_mentions_match_text():
+    grants = generate_grants(300, seed=9)
+    grants[10] = None  # deleted row
+    store = GrantFeatureStore.build(grants)
+    texts = [" ".join(str(v) for v in g.values()).lower() if g else "" for g in grants]
+    grant_ids = [3, 10, 3, 250, 0, 299]
+    queries = ["texas fire department radios", "", "body armor for police in ohio"]
+    owners = [0, 0, 1, 2, 2, 1]
+    expected = []
+    for g, owner in zip(grant_ids, owners):
+        query_tokens, grant_tokens = set(queries[owner].split()), set(texts[g].split())
+        expected.append(len(query_tokens & grant_tokens) / len(query_tokens | grant_tokens)
+                        if query_tokens and grant_tokens else 0.0)
+    overlaps = store.token_overlap(grant_ids, [token_hashes(q) for q in queries], owners)
+    assert overlaps.tolist() == expected
+    for state in ("texas", "kansas", "new york", ""):
+        expected = [bool(grants[g]) and state in texts[g] for g in grant_ids]
+        assert store.mentions(grant_ids, state).tolist() == expected
+    assert store.token_overlap([], [token_hashes("texas")], []).shape == (0,)
+    np.testing.assert_array_equal(store.token_counts[[0, 10]],
+                                  [len(set(texts[0].split())), 0])
+
+
+def test_chunked_build_matches_single_chunk():
+    grants = generate_grants(50, seed=2)
+    grants[7] = grants[20] = None
+    whole = GrantFeatureStore.build(grants, chunk_rows=len(grants) + 1).arrays()
+    for chunk_rows in (1, 7, 25):
+        arrays = GrantFeatureStore.build(grants, chunk_rows=chunk_rows).arrays()
+        assert arrays.keys() == whole.keys()
+        for name, array in arrays.items():
+            if isinstance(array, np.ndarray):
+                np.testing.assert_array_equal(array, whole[name])
+            else:
+                assert array.equals(whole[name])
@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+from benchmarks.synthetic import GRANT_COLUMNS, generate_grants, write_csv
+from data_loader import GrantIndexer
+from features import token_hashes
+from index_cache import IndexCache
+from metadata import RowFilter
+from sharding import ShardMap
+
+
+def test_warm_load_maps_derived_arrays(tmp_path):
+    csv_path = str(tmp_path / "grants.csv")
+    write_csv(csv_path, generate_grants(200, seed=4), GRANT_COLUMNS)
+    cold = GrantIndexer(cache=None)
+    cold.load_grants(csv_path)
+    GrantIndexer(cache=IndexCache(tmp_path / "cache")).load_grants(csv_path)
+    warm = GrantIndexer(cache=IndexCache(tmp_path / "cache"))
+    warm.load_grants(csv_path)
+
+    assert isinstance(warm.features.deadlines, np.memmap)
+    assert isinstance(warm.metadata.live, np.memmap)
+    np.testing.assert_array_equal(warm._state.keys, cold._state.keys)
+    np.testing.assert_array_equal(warm.features.token_counts, cold.features.token_counts)
+    tokens = token_hashes("texas fire department grant radios")
+    np.testing.assert_array_equal(warm.features.token_overlap([0, 57, 199], [tokens], [0, 0, 0]),
+                                  cold.features.token_overlap([0, 57, 199], [tokens], [0, 0, 0]))
+    row_filter = RowFilter(state="Texas", open_only=True)
+    assert (warm.metadata.mask(row_filter) == cold.metadata.mask(row_filter)).all()
+    for term in ("radios", "body armor", "bodyarmor", "fire department"):
+        assert warm.features.keywords.lookup(term) == cold.features.keywords.lookup(term)
+
+
+def test_shards_sharing_a_cache_keep_their_entries(tmp_path, monkeypatch):
+    monkeypatch.setattr("data_loader.shard_map", ShardMap("west=california,nevada;south=texas"))
+    csv_path = str(tmp_path / "grants.csv")
+    write_csv(csv_path, generate_grants(300, seed=8), GRANT_COLUMNS)
+    cache = IndexCache(tmp_path / "cache")
+    keys = []
+    for shard in ("west", "south", "national"):
+        indexer = GrantIndexer(cache=cache, shard=shard)
+        indexer.load_grants(csv_path)
+        keys.append(indexer._cache_entry)
+
+    assert len(set(keys)) == 3
+    for key in keys:
+        assert cache.load(key) is not None
+
+
+@pytest.mark.parametrize("shard", [None, "west"])
+def test_new_csv_revision_prunes_the_old_entry(tmp_path, monkeypatch, shard):
+    monkeypatch.setattr("data_loader.shard_map", ShardMap("west=california,nevada"))
+    csv_path = str(tmp_path / "grants.csv")
+    cache = IndexCache(tmp_path / "cache")
+    keys = []
+    for seed in (1, 2):
+        write_csv(csv_path, generate_grants(100, seed=seed), GRANT_COLUMNS)
+        indexer = GrantIndexer(cache=cache, shard=shard)
+        indexer.load_grants(csv_path)
+        keys.append(indexer._cache_entry)
+
+    assert cache.load(keys[0]) is None and cache.load(keys[1]) is not None
+
+
+def test_index_build_settings_are_part_of_the_key(tmp_path, monkeypatch):
+    csv_path = str(tmp_path / "grants.csv")
+    write_csv(csv_path, generate_grants(50, seed=3), GRANT_COLUMNS)
+    indexer = GrantIndexer(cache=None, index_type="ivfpq")
+    key = indexer._cache_key(csv_path)
+    monkeypatch.setattr("index_factory.INDEX_NPROBE", 64)
+    assert indexer._cache_key(csv_path) == key
+    for setting in ("INDEX_NLIST", "INDEX_PQ_M"):
+        with monkeypatch.context() as patch:
+            patch.setattr(f"index_factory.{setting}", 128)
+            assert indexer._cache_key(csv_path) != key
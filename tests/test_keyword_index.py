@@ -0,0 +1,22 @@
+from keyword_index import EXACT, JOINED, STEMMED, KeywordIndex
+
+TEXTS = ["Portable radios and body-armor for the EMS team", "Information systems upgrade",
+         "Bodyarmor vests", None, "thermal", "cameras for the fire department"]
+
+
+def test_lookup_strengths():
+    index = KeywordIndex.from_texts(TEXTS)
+    assert index.lookup("radios") == {0: EXACT}
+    assert index.lookup("radio") == {0: STEMMED}
+    assert index.lookup("body armor") == {0: EXACT, 2: JOINED}
+    assert index.lookup("bodyarmor") == {0: JOINED, 2: EXACT}
+    assert index.lookup("armor vest") == {}
+    assert index.lookup("fire department") == {5: EXACT}
+    assert index.lookup("the fire departments") == {5: STEMMED}
+
+
+def test_phrases_do_not_span_grants():
+    index = KeywordIndex.from_texts(TEXTS)
+    assert index.lookup("thermal cameras") == {}
+    assert index.lookup("thermalcameras") == {}
+    assert index.lookup("") == {}
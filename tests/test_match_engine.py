@@ -0,0 +1,65 @@
+import pytest
+
+from benchmarks.synthetic import (BUYER_COLUMNS, GRANT_COLUMNS, generate_buyers, generate_grants,
+                                  generate_rep_inputs, write_csv)
+
+
+@pytest.fixture
+def loaded(tmp_path):
+    import match_engine
+    from data_loader import buyer_indexer, grant_indexer
+    from precompute import buyer_grant_neighbors
+    grants_csv = str(tmp_path / "grants.csv")
+    write_csv(tmp_path / "buyers.csv", generate_buyers(120, seed=3), BUYER_COLUMNS)
+    write_csv(grants_csv, generate_grants(400, seed=4), GRANT_COLUMNS)
+    buyer_indexer.load_buyers(str(tmp_path / "buyers.csv"))
+    grant_indexer.load_grants(grants_csv)
+    buyer_grant_neighbors.build()
+    match_engine.result_cache.clear()
+    return match_engine, grant_indexer, buyer_grant_neighbors, grants_csv
+
+
+@pytest.mark.parametrize("use_precomputed", [True, False])
+@pytest.mark.parametrize("rep_id", range(3))
+def test_refresh_mid_request_keeps_the_request_on_one_snapshot(loaded, monkeypatch,
+                                                              use_precomputed, rep_id):
+    from models import SalesRepDropdownInput
+    matcher, grant_indexer, neighbors, grants_csv = loaded
+    rep = SalesRepDropdownInput(**generate_rep_inputs(3, seed=5)[rep_id])
+    expected = matcher.get_ranked_matches_cosine(rep, 10, 10, use_precomputed)
+    assert expected
+    matcher.result_cache.clear()
+
+    # the request's first grant retrieval is followed by a refresh dropping what it returned
+    grants = generate_grants(400, seed=4)
+
+    def then_refresh(retrieve):
+        def wrapper(*args, **kwargs):
+            hits = retrieve(*args, **kwargs)
+            monkeypatch.undo()
+            dropped = {grant["Grant Program Name"] for row in hits for _, grant, _ in row}
+            write_csv(grants_csv, [g for g in grants if g["Grant Program Name"] not in dropped],
+                      GRANT_COLUMNS)
+            assert grant_indexer.refresh_grants(grants_csv)["removed"]
+            return hits
+        return wrapper
+
+    monkeypatch.setattr(grant_indexer, "search_by_vectors",
+                        then_refresh(grant_indexer.search_by_vectors))
+    monkeypatch.setattr(neighbors, "grants_for", then_refresh(neighbors.grants_for))
+    assert matcher.get_ranked_matches_cosine(rep, 10, 10, use_precomputed) == expected
+
+
+def test_result_cache_key_ignores_case_and_spacing(loaded):
+    from models import SalesRepDropdownInput
+    matcher = loaded[0]
+    states = matcher.index_states()
+    key = matcher._result_cache_key(
+        SalesRepDropdownInput(agency_type="Fire Department", product_type="Body Armor",
+                              state="Texas"), states, 5, 5, True, True)
+    assert matcher._result_cache_key(
+        SalesRepDropdownInput(agency_type=" fire  department", product_type="BODY ARMOR ",
+                              state="texas"), states, 5, 5, True, True) == key
+    assert matcher._result_cache_key(
+        SalesRepDropdownInput(agency_type="Fire Department", product_type="Body Armor",
+                              state="Ohio"), states, 5, 5, True, True) != key
@@ -0,0 +1,32 @@
+from data_loader import BuyerIndexer
+from metadata import MetadataIndex, RowFilter
+from sharding import ShardMap
+
+BUYERS = [
+    {"Agency Name": "Austin Fire", "Agency Type": "Fire Department", "State": "TX"},
+    {"Agency Name": "Reno EMS", "Agency Type": "EMS", "State": "Nevada"},
+    {"Agency Name": "Tahoe Rescue", "Agency Type": "EMS", "State": "CA / NV"},
+    {"Agency Name": "Texas City Police", "Agency Type": "Law Enforcement", "State": ""},
+    {"Agency Name": "Federal Office", "Agency Type": "EMS", "State": "N/A"},
+]
+
+
+def test_row_states_reads_codes_and_names():
+    indexer = BuyerIndexer(cache=None)
+    assert [sorted(indexer.row_states(b)) for b in BUYERS] == [
+        ["texas"], ["nevada"], ["california", "nevada"], ["texas"], []]
+
+
+def test_state_filter_keeps_coded_rows():
+    indexer = BuyerIndexer(cache=None)
+    metadata = indexer.build_metadata(BUYERS, None)
+    assert metadata.mask(RowFilter(state="TX")).tolist() == [True, False, False, True, True]
+    assert metadata.mask(RowFilter(state="nevada", agency_type="ems")).tolist() == [
+        False, True, True, False, True]
+    assert MetadataIndex([frozenset()]).mask(RowFilter(state="ohio")) is None
+
+
+def test_coded_rows_stay_on_their_shard(monkeypatch):
+    monkeypatch.setattr("data_loader.shard_map", ShardMap("south=texas;west=california,nevada"))
+    south = BuyerIndexer(cache=None, shard="south")
+    assert [south.owns(b) for b in BUYERS] == [True, False, False, True, True]
@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+from benchmarks.synthetic import (BUYER_COLUMNS, GRANT_COLUMNS, generate_buyers, generate_grants,
+                                  write_csv)
+from data_loader import BuyerIndexer, GrantIndexer
+from precompute import BuyerGrantNeighbors
+
+
+@pytest.fixture
+def loaded(tmp_path):
+    buyers_csv, grants_csv = str(tmp_path / "buyers.csv"), str(tmp_path / "grants.csv")
+    write_csv(buyers_csv, generate_buyers(60, seed=1), BUYER_COLUMNS)
+    write_csv(grants_csv, generate_grants(300, seed=2), GRANT_COLUMNS)
+    buyers, grants = BuyerIndexer(cache=None), GrantIndexer(cache=None)
+    buyers.load_buyers(buyers_csv)
+    grants.load_grants(grants_csv)
+    return buyers, grants, buyers_csv, grants_csv
+
+
+def query(grants, text="body armor for texas sheriffs"):
+    return grants.embedder.encode_query(text)
+
+
+def test_refresh_rebuilds_neighbours_eagerly(loaded):
+    buyers, grants, buyers_csv, grants_csv = loaded
+    neighbors = BuyerGrantNeighbors(buyers, grants)
+    neighbors.build()
+    rows = generate_buyers(70, seed=1)
+    rows[3]["Product Name"] = "Rescue Boats"
+    write_csv(buyers_csv, rows, BUYER_COLUMNS)
+    buyers.refresh_buyers(buyers_csv)
+    write_csv(grants_csv, generate_grants(280, seed=2), GRANT_COLUMNS)
+    grants.refresh_grants(grants_csv)
+
+    ids, _, versions = neighbors.snapshot
+    assert versions == (buyers.version, grants.version)
+    assert len(ids) == len(buyers.records) == 70
+
+
+def test_uncovered_buyers_fall_back_to_search(loaded):
+    buyers, grants, _, _ = loaded
+    # every grant is a neighbour, so re-ranking and searching see the same candidates
+    neighbors = BuyerGrantNeighbors(buyers, grants, top_n=len(grants.records))
+    neighbors.build()
+    buyer_ids = list(range(0, 60, 7))
+    reranked = neighbors.grants_for(buyer_ids, query(grants), top_k=5)
+    ids, scores, versions = neighbors.snapshot
+    neighbors.snapshot = (ids[:3], scores[:3], versions)  # buyers added after the build
+    partial = neighbors.grants_for(buyer_ids, query(grants), top_k=5)
+    neighbors.snapshot = None
+    searched = neighbors.grants_for(buyer_ids, query(grants), top_k=5)
+    for expected, *others in zip(reranked, partial, searched):
+        for hits in others:
+            assert [g for g, _, _ in hits] == [g for g, _, _ in expected]
+            np.testing.assert_allclose([s for _, _, s in hits], [s for _, _, s in expected],
+                                       atol=1e-3)
+
+
+def test_filtered_neighbours_fill_top_k(loaded):
+    buyers, grants, _, _ = loaded
+    from metadata import RowFilter
+    row_filter = RowFilter(state="Vermont", open_only=True)
+    eligible = int(grants.metadata.mask(row_filter).sum())
+    assert 5 <= eligible < 100
+    # too few precomputed neighbours to survive a narrow filter
+    neighbors = BuyerGrantNeighbors(buyers, grants, top_n=10)
+    neighbors.build()
+    exact = BuyerGrantNeighbors(buyers, grants, top_n=len(grants.records))
+    exact.build()
+    buyer_ids = list(range(0, 60, 5))
+    for hits, expected in zip(neighbors.grants_for(buyer_ids, query(grants), 5, row_filter),
+                              exact.grants_for(buyer_ids, query(grants), 5, row_filter)):
+        assert len(hits) == 5
+        assert [g for g, _, _ in hits] == [g for g, _, _ in expected]
+        assert grants.metadata.mask(row_filter)[[g for g, _, _ in hits]].all()
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from benchmarks.synthetic import GRANT_COLUMNS, generate_grants, write_csv
+from data_loader import GrantIndexer
+from index_cache import IndexCache
+from index_factory import INDEX_TYPES, MIN_TRAIN_ROWS, configure_search
+
+
+def self_search_hits(state, ids, k=10):
+    """Share of rows found among the top ``k`` when searching their own stored vector."""
+    configure_search(state.index, nprobe=1 << 20, ef_search=256)
+    _, found = state.index.search(np.ascontiguousarray(state.embeddings[ids]), k)
+    assert set(found.ravel()) - {-1} <= set(int(i) for i in state.records.live_ids())
+    return float(np.mean([i in row for i, row in zip(ids, found)]))
+
+
+@pytest.mark.parametrize("index_type", INDEX_TYPES)
+def test_refresh_keeps_row_ids(index_type, tmp_path, monkeypatch):
+    # train the approximate types on a small CSV instead of falling back to flat
+    monkeypatch.setitem(MIN_TRAIN_ROWS, index_type, 0)
+    csv_path = str(tmp_path / "grants.csv")
+    rows = generate_grants(1500, seed=1)
+    write_csv(csv_path, rows, GRANT_COLUMNS)
+    indexer = GrantIndexer(cache=IndexCache(tmp_path / "cache"), index_type=index_type)
+    indexer.load_grants(csv_path)
+
+    for row in rows[:20]:
+        row["Purpose"] = f"Replacement generators and rescue boats for {row['Grant Program Name']}"
+    del rows[100:130]
+    added = generate_grants(25, seed=2)
+    for row in added:
+        row["Grant Program Name"] += " (new)"
+    write_csv(csv_path, rows + added, GRANT_COLUMNS)
+
+    assert indexer.refresh_grants(csv_path) == {"added": 25, "changed": 20, "removed": 30}
+    state = indexer._state
+    live = state.records.live_ids()
+    assert state.index.ntotal == len(live) == 1495
+    upserted = np.concatenate([np.arange(20), np.arange(1500, 1525)])
+    assert self_search_hits(state, upserted) >= 0.9
+    assert self_search_hits(state, live) >= 0.9
+
+    # a fresh worker maps the refreshed cache entry with the same ids
+    warm = GrantIndexer(cache=IndexCache(tmp_path / "cache"), index_type=index_type)
+    warm.load_grants(csv_path)
+    assert self_search_hits(warm._state, live) >= 0.9
@@ -0,0 +1,82 @@
+import math
+
+import numpy as np
+import pytest
+
+from benchmarks.synthetic import (BUYER_COLUMNS, GRANT_COLUMNS, generate_buyers, generate_grants,
+                                  generate_rep_inputs, write_csv)
+from scoring import (W_BUYER, W_GRANT, W_LEX, W_DEADLINE, W_GEO, RAW_CAP, SIGMOID_SLOPE,
+                     SIGMOID_CENTER, DEADLINE_MULTIPLIER, score_candidates)
+
+
+def scalar_score(buyer_score, grant_score, lex, ddl, geo, keyword_boost):
+    """The per-pair formula score_candidates replaced."""
+    raw = (W_BUYER * buyer_score + W_GRANT * grant_score + W_LEX * lex + W_DEADLINE * ddl +
+           W_GEO * geo + keyword_boost)
+    raw = min(raw, RAW_CAP)
+    conf = (1 / (1 + math.exp(-SIGMOID_SLOPE * (raw - SIGMOID_CENTER)))) * 100
+    return raw, round(min(100, conf * (1 + DEADLINE_MULTIPLIER * ddl)), 2)
+
+
+def test_score_candidates_matches_scalar_formula():
+    rng = np.random.default_rng(0)
+    n = 2000
+    inputs = [rng.uniform(0, 1, n), rng.uniform(0, 1, n), rng.uniform(0, 1, n),
+              rng.choice([0.0, 0.5, 1.0], n) * rng.uniform(0, 1, n), rng.choice([0.7, 1.0], n),
+              rng.uniform(-0.1, 0.6, n)]
+    raw, conf = score_candidates(*inputs)
+    for i in range(n):
+        expected_raw, expected_conf = scalar_score(*(float(x[i]) for x in inputs))
+        assert raw[i] == pytest.approx(expected_raw, abs=1e-12)
+        assert conf[i] == pytest.approx(expected_conf, abs=1e-9)
+    assert (raw <= RAW_CAP).all() and (conf <= 100).all()
+
+
+@pytest.fixture(scope="module")
+def matcher(tmp_path_factory):
+    data = tmp_path_factory.mktemp("data")
+    write_csv(data / "buyers.csv", generate_buyers(300, seed=5), BUYER_COLUMNS)
+    write_csv(data / "grants.csv", generate_grants(1200, seed=6), GRANT_COLUMNS)
+    import match_engine
+    from data_loader import buyer_indexer, grant_indexer
+    from precompute import buyer_grant_neighbors
+    buyer_indexer.load_buyers(str(data / "buyers.csv"))
+    grant_indexer.load_grants(str(data / "grants.csv"))
+    buyer_grant_neighbors.build()
+    return match_engine
+
+
+@pytest.mark.parametrize("use_precomputed", [True, False])
+@pytest.mark.parametrize("top_k", [5, 20])
+def test_cascade_returns_full_ranking_prefix(matcher, monkeypatch, use_precomputed, top_k):
+    from models import SalesRepDropdownInput
+    rank = matcher._rank_matches
+
+    def cached_ranking(rep_input):
+        return matcher.result_cache.get(matcher._result_cache_key(
+            rep_input, matcher.index_states(), top_k, top_k, use_precomputed,
+            matcher.MATCH_PREFILTER))
+
+    for rep in generate_rep_inputs(12, seed=7):
+        rep_input = SalesRepDropdownInput(**rep)
+        for limit in (1, 3, 10):
+            matcher.result_cache.clear()
+            full = matcher.get_ranked_matches_cosine(rep_input, top_k, top_k, use_precomputed)
+            matcher.result_cache.clear()
+            cut = matcher.get_ranked_matches_cosine(rep_input, top_k, top_k, use_precomputed,
+                                                    limit=limit)
+            assert cut == full[:limit]
+            # the next page needs depth 2 * limit, more than the cached cascade covers,
+            # so it is ranked again (and cached at the new depth)
+            assert not cached_ranking(rep_input).covers(2 * limit)
+            assert matcher.get_ranked_matches_cosine(rep_input, top_k, top_k, use_precomputed,
+                                                     limit=limit, offset=limit) == \
+                full[limit:2 * limit]
+            assert cached_ranking(rep_input).covers(2 * limit)
+
+            # a shallower page is served by the deeper cached ranking, without ranking again
+            monkeypatch.setattr(matcher, "_rank_matches", None)
+            assert matcher.get_ranked_matches_cosine(rep_input, top_k, top_k, use_precomputed,
+                                                     limit=1, offset=limit) == \
+                full[limit:limit + 1]
+            monkeypatch.setattr(matcher, "_rank_matches", rank)
@@ -0,0 +1,99 @@
+import re
+import threading
+from collections import Counter
+
+import numpy as np
+
+_WORD_RE = re.compile(r"\S+")
+
+
+# ----------------- Text Builder -----------------
+class TextBuilder:
+    """
+    The text embedded for a CSV row.
+
+    ``fields`` are the columns to use, highest signal first; other columns
+    (IDs, URLs, amounts) and blank cells are left out. ``None`` keeps every
+    column in CSV order. The text is cut to ``max_tokens`` tokens of the
+    embedder's tokenizer (0 = the model's window, ``max_seq_length`` minus
+    [CLS]/[SEP]), so the lowest-priority fields are the ones dropped. Encoders
+    without a tokenizer count whitespace-separated words instead.
+
+    Token counts of every row text built are kept for ``stats()``.
+    """
+
+    # [CLS] and [SEP], added by the model on top of the text's own tokens
+    SPECIAL_TOKENS = 2
+
+    def __init__(self, embedder, fields=None, max_tokens=0):
+        self.embedder = embedder
+        self.fields = tuple(fields) if fields else None
+        self.max_tokens = max_tokens
+        self._lengths = Counter()
+        self._truncated = 0
+        self._lock = threading.Lock()
+
+    def key(self) -> str:
+        """Everything the built texts depend on besides the model (for index cache keys)."""
+        return f"{','.join(self.fields or ('*',))}|{self.max_tokens}"
+
+    @property
+    def budget(self) -> int:
+        if self.max_tokens:
+            return self.max_tokens
+        window = getattr(self.embedder.model, "max_seq_length", None) or 512
+        return window - self.SPECIAL_TOKENS
+
+    def parts(self, record):
+        """Non-blank cells of the selected fields in priority order (every cell without ``fields``)."""
+        if self.fields is None:
+            return [str(v) for v in record.values()]
+        parts = [str(record.get(field, "")).strip() for field in self.fields]
+        parts = [p for p in parts if p]
+        # a CSV without any of the configured columns still gets embedded
+        return parts or [str(v) for v in record.values()]
+
+    def __call__(self, record) -> str:
+        """Index text for one row; its token count goes into ``stats()``."""
+        text, length = self._fit(" ".join(self.parts(record)), self.budget)
+        with self._lock:
+            self._lengths[length] += 1
+            self._truncated += length > self.budget
+        return text
+
+    def query(self, record, suffix) -> str:
+        """Row text plus ``suffix`` (kept whole) within the budget, for query encodes."""
+        budget = self.budget - len(self._spans(suffix))
+        text, _ = self._fit(" ".join(self.parts(record)), max(budget, 0))
+        return f"{text} {suffix}" if text else suffix
+
+    def _spans(self, text):
+        """(start, end) character span of each token of ``text``."""
+        tokenizer = getattr(self.embedder.model, "tokenizer", None)
+        if tokenizer is not None:
+            try:
+                return tokenizer(text, add_special_tokens=False,
+                                 return_offsets_mapping=True)["offset_mapping"]
+            except NotImplementedError:  # slow (Python) tokenizers have no offsets
+                pass
+        return [m.span() for m in _WORD_RE.finditer(text)]
+
+    def _fit(self, text, budget):
+        """``text`` cut after its ``budget``-th token, and its untruncated token count."""
+        spans = self._spans(text)
+        if len(spans) <= budget:
+            return text, len(spans)
+        return (text[:spans[budget - 1][1]] if budget else ""), len(spans)
+
+    def stats(self) -> dict:
+        """Token counts of the row texts built so far (before truncation), plus the budget."""
+        with self._lock:
+            lengths, truncated = dict(self._lengths), self._truncated
+        if not lengths:
+            return {"rows": 0}
+        values = np.repeat(np.fromiter(lengths, dtype=np.int64),
+                           np.fromiter(lengths.values(), dtype=np.int64))
+        return {"rows": int(len(values)), "budget": self.budget,
+                "mean": float(values.mean()), "p50": float(np.percentile(values, 50)),
+                "p95": float(np.percentile(values, 95)), "max": int(values.max()),
+                "truncated": truncated}